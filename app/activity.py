@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from app.config import (
+    ACTIVITY_FLUSH_INTERVAL,
+    ACTIVITY_BATCH_SIZE,
+    ACTIVITY_MAX_PENDING
+)
+from app.database.crud import apply_login_activity
+from app.database.database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ("logins", "failures", "keep", "last_login_at", "queued_at")
+
+    def __init__(self, queued_at: float):
+        self.logins = 0
+        self.failures = 0
+        # 1 — неудачи прибавляются к счётчику в БД, 0 — был успешный вход и счётчик начинается заново
+        self.keep = 1
+        self.last_login_at: datetime | None = None
+        self.queued_at = queued_at
+
+    def merge(self, later: "_Pending"):
+        """Добавляет более поздние события того же пользователя."""
+        self.logins += later.logins
+        self.last_login_at = later.last_login_at or self.last_login_at
+        if later.keep:
+            self.failures += later.failures
+        else:
+            self.failures = later.failures
+            self.keep = 0
+
+
+class LoginActivityRecorder:
+    """
+    Write-behind запись активности входа: last_login_at, login_count,
+    failed_login_count.
+
+    Обработчик входа только обновляет словарь в памяти (email -> накопленные
+    изменения), без обращения к БД. Фоновая задача раз в `interval` секунд
+    или при `batch_size` пользователях в буфере записывает всё одним
+    executemany. События одного пользователя между сбросами сливаются в одну
+    строку. Буфер ограничен `max_pending` пользователями: события новых
+    пользователей сверх лимита отбрасываются и считаются в `dropped`.
+    При остановке буфер сбрасывается полностью.
+    """
+
+    def __init__(self, interval: float, batch_size: int, max_pending: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: dict[str, _Pending] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.recorded = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.errors = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+        self.last_flush_seconds = 0.0
+
+    def record(self, email: str, success: bool):
+        email = email.lower()
+        pending = self._pending.get(email)
+        if pending is None:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            pending = self._pending[email] = _Pending(time.monotonic())
+        if success:
+            pending.logins += 1
+            pending.failures = 0
+            pending.keep = 0
+            pending.last_login_at = datetime.now(timezone.utc)
+        else:
+            pending.failures += 1
+        self.recorded += 1
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="login-activity-recorder")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        rows = [
+            {
+                "p_email": email,
+                "p_logins": pending.logins,
+                "p_failures": pending.failures,
+                "p_keep": pending.keep,
+                "p_last_login_at": pending.last_login_at,
+            }
+            for email, pending in batch.items()
+        ]
+        started = time.monotonic()
+        try:
+            async with async_session_maker() as db:
+                await apply_login_activity(db, rows)
+        except Exception:
+            self.errors += 1
+            logger.exception("Login activity flush failed, %d users kept for retry", len(batch))
+            # Возвращаем несохранённое в буфер перед событиями, пришедшими во время записи
+            for email, pending in self._pending.items():
+                if email in batch:
+                    batch[email].merge(pending)
+                elif len(batch) < self.max_pending:
+                    batch[email] = pending
+                else:
+                    self.dropped += pending.logins + pending.failures
+            self._pending = batch
+            return
+
+        finished = time.monotonic()
+        self.flushes += 1
+        self.flushed_rows += len(rows)
+        self.last_flush_seconds = finished - started
+        # Задержка записи: сколько ждало самое старое событие в пачке
+        self.last_flush_lag = finished - min(pending.queued_at for pending in batch.values())
+        self.max_flush_lag = max(self.max_flush_lag, self.last_flush_lag)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "errors": self.errors,
+            "last_flush_seconds": self.last_flush_seconds,
+            "last_flush_lag_seconds": self.last_flush_lag,
+            "max_flush_lag_seconds": self.max_flush_lag,
+        }
+
+
+login_activity = LoginActivityRecorder(ACTIVITY_FLUSH_INTERVAL, ACTIVITY_BATCH_SIZE, ACTIVITY_MAX_PENDING)
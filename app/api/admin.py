@@ -1,21 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+from collections import Counter
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.users import (
-    User as UserResponse,
+    UserPage,
     UserPassword,
     UserUpdateAdmin
 )
+from app.schemas.bulk import (
+    BulkDeactivate,
+    BulkUpdate,
+    BulkResult,
+    UserImport
+)
+from app.config import BULK_MAX_ITEMS
+from app.api.responses import (
+    FastJSONResponse,
+    PRIVATE_CACHE_CONTROL,
+    versions_etag,
+    etag_matches,
+    not_modified
+)
 from app.database.users import User as UserModel
-from app.database.db_depends import get_async_db
-from app.auth import get_current_role_admin, verify_password
+from app.database.db_depends import get_async_db, get_async_read_db
+from app.auth import get_current_role_admin, verify_password_async
 
 from app.database.crud import (
     get_active_users,
     get_deleted_users,
+    get_active_users_versions,
+    get_deleted_users_versions,
     update_user_by_id,
     deactivate_user_by_id,
-    get_user_by_id
+    get_password_hash,
+    decode_cursor,
+    search_users,
+    decode_search_cursor,
+    SEARCH_MODES,
+    deactivate_users_bulk,
+    update_users_bulk,
+    import_users_bulk
 )
 
 
@@ -25,30 +55,107 @@ router = APIRouter(
 )
 
 
+def page_params(
+    limit: int = Query(50, ge=1, le=500, description="Размер страницы"),
+    cursor: str | None = Query(None, description="next_cursor из предыдущего ответа"),
+    role: str | None = Query(None, pattern="^(user|admin)$", description="Фильтр по роли"),
+    created_from: datetime | None = Query(None, description="Созданы не раньше"),
+    created_to: datetime | None = Query(None, description="Созданы раньше")
+) -> dict:
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+    return {
+        "limit": limit,
+        "after": after,
+        "role": role,
+        "created_from": created_from,
+        "created_to": created_to
+    }
+
+
+async def users_page_response(request: Request, db: AsyncSession, params: dict, load_page, load_versions):
+    """
+    Страница списка с ETag. При If-None-Match сначала читаются только
+    (id, updated_at) строк страницы: если ничего не изменилось, ответ 304
+    без загрузки и сериализации самих строк.
+    """
+    if request.headers.get("if-none-match"):
+        versions, more = await load_versions(db, **params)
+        etag = versions_etag(versions, more)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    # Строки уже в форме UserPage: response_model остаётся только для документации
+    users, next_cursor = await load_page(db, **params)
+    etag = versions_etag(((user["id"], user["updated_at"]) for user in users), next_cursor is not None)
+    return FastJSONResponse(
+        {"items": users, "next_cursor": next_cursor},
+        headers={"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL}
+    )
+
+
 @router.get(
     "/",
-    response_model=list[UserResponse],
+    response_model=UserPage,
+    response_class=FastJSONResponse,
     status_code=status.HTTP_200_OK
 )
 async def get_all_active_users(
+    request: Request,
+    params: dict = Depends(page_params),
     current_admin: UserModel = Depends(get_current_role_admin),
-    db: AsyncSession = Depends(get_async_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    users = await get_active_users(db)
-    return list(users)
+    return await users_page_response(request, db, params, get_active_users, get_active_users_versions)
 
 
 
 @router.get(
     "/deleted",
-    response_model=list[UserResponse],
+    response_model=UserPage,
+    response_class=FastJSONResponse,
     status_code=status.HTTP_200_OK
 )
 async def get_all_deleted_users(
+    request: Request,
+    params: dict = Depends(page_params),
     current_admin: UserModel = Depends(get_current_role_admin),
-    db: AsyncSession = Depends(get_async_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    return await get_deleted_users(db)
+    return await users_page_response(request, db, params, get_deleted_users, get_deleted_users_versions)
+
+
+
+@router.get(
+    "/search",
+    response_model=UserPage,
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK
+)
+async def search(
+    q: str = Query(..., min_length=3, max_length=100, description="Строка поиска по ФИО и email"),
+    mode: str = Query("substring", pattern=f"^({'|'.join(SEARCH_MODES)})$",
+                      description="prefix — начало слова, substring — подстрока, fuzzy — с опечатками"),
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    cursor: str | None = Query(None, description="next_cursor из предыдущего ответа"),
+    deleted: bool = Query(False, description="Искать среди удалённых пользователей"),
+    current_admin: UserModel = Depends(get_current_role_admin),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    try:
+        after = decode_search_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+    users, next_cursor = await search_users(db, q, mode, limit, is_active=not deleted, after=after)
+    return FastJSONResponse({"items": users, "next_cursor": next_cursor})
 
 
 
@@ -59,18 +166,16 @@ async def update_user(
     current_admin: UserModel = Depends(get_current_role_admin),
     db: AsyncSession = Depends(get_async_db)
 ):
-    user = await get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-
-    await update_user_by_id(
+    updated = await update_user_by_id(
         db,
         user_id,
         data.model_dump(exclude_unset=True)
     )
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пользователь не найден"
+        )
 
     return {"message": "Изменения сохранены"}
 
@@ -86,20 +191,150 @@ async def delete_user(
     current_admin: UserModel = Depends(get_current_role_admin),
     db: AsyncSession = Depends(get_async_db)
 ):
-    if not verify_password(password.password, current_admin.password_hash):
+    password_hash = await get_password_hash(db, current_admin)
+    if not await verify_password_async(password.password, password_hash):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Неверный пароль"
         )
 
-    user = await get_user_by_id(db, user_id)
-    if not user or not user.is_active:
+    if await deactivate_user_by_id(db, user_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Аккаунт либо удален, либо не существует"
         )
 
-    await deactivate_user_by_id(db, user_id)
-
     return {"message": "Аккаунт удален"}
 
+
+
+def bulk_response(results: list[dict]) -> dict:
+    return {
+        "results": results,
+        "summary": dict(Counter(item["status"] for item in results))
+    }
+
+
+def parse_import_file(file: UploadFile, content: bytes) -> list[tuple[int, dict | None]]:
+    """Пары (номер строки в файле, запись); для CSV строка 1 — заголовок."""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Файл должен быть в кодировке UTF-8"
+        )
+
+    is_csv = (file.filename or "").lower().endswith(".csv") or file.content_type == "text/csv"
+    if is_csv:
+        reader = csv.DictReader(io.StringIO(text))
+        return [(reader.line_num, row) for row in reader]
+
+    rows = []
+    for line_num, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append((line_num, json.loads(line)))
+        except json.JSONDecodeError:
+            rows.append((line_num, None))
+    return rows
+
+
+@router.post(
+    "/bulk/deactivate",
+    response_model=BulkResult,
+    status_code=status.HTTP_200_OK
+)
+async def bulk_deactivate_users(
+    data: BulkDeactivate,
+    current_admin: UserModel = Depends(get_current_role_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    password_hash = await get_password_hash(db, current_admin)
+    if not await verify_password_async(data.password, password_hash):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Неверный пароль"
+        )
+
+    deactivated = await deactivate_users_bulk(db, data.ids)
+
+    results, seen = [], set()
+    for user_id in data.ids:
+        if user_id in seen:
+            results.append({"id": user_id, "status": "duplicate"})
+            continue
+        seen.add(user_id)
+        results.append({"id": user_id, "status": "deactivated" if user_id in deactivated else "not_found"})
+    return bulk_response(results)
+
+
+@router.post(
+    "/bulk/update",
+    response_model=BulkResult,
+    status_code=status.HTTP_200_OK
+)
+async def bulk_update_users(
+    data: BulkUpdate,
+    current_admin: UserModel = Depends(get_current_role_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    updated = await update_users_bulk(
+        db,
+        [item.model_dump(exclude_unset=True) for item in data.items]
+    )
+
+    return bulk_response([
+        {"id": item.id, "status": "updated" if item.id in updated else "not_found"}
+        for item in data.items
+    ])
+
+
+@router.post(
+    "/bulk/import",
+    response_model=BulkResult,
+    status_code=status.HTTP_200_OK
+)
+async def bulk_import_users(
+    file: UploadFile,
+    current_admin: UserModel = Depends(get_current_role_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Импорт пользователей из CSV (с заголовком) или NDJSON, одна запись на строку."""
+    rows = parse_import_file(file, await file.read())
+    if len(rows) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Не больше {BULK_MAX_ITEMS} записей за раз"
+        )
+
+    results: list[dict] = []
+    valid: dict[str, dict] = {}
+    for line, row in rows:
+        if row is None:
+            results.append({"line": line, "status": "invalid", "detail": "Некорректный JSON"})
+            continue
+        try:
+            user = UserImport.model_validate(row)
+        except ValidationError as exc:
+            results.append({"line": line, "status": "invalid", "detail": str(exc.errors()[0]["msg"])})
+            continue
+        if user.email.lower() in valid:
+            results.append({"line": line, "email": user.email, "status": "conflict", "detail": "Email повторяется в файле"})
+            continue
+        valid[user.email.lower()] = user.model_dump()
+        results.append({"line": line, "email": user.email})
+
+    created = await import_users_bulk(db, list(valid.values()))
+
+    for item in results:
+        if "status" in item:
+            continue
+        user_id = created.get(item["email"])
+        if user_id is None:
+            item.update(status="conflict", detail="Email уже существует")
+        else:
+            item.update(id=user_id, status="created")
+
+    return bulk_response(results)
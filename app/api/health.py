@@ -0,0 +1,66 @@
+import time
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.config import HEALTH_MAX_POOL_SATURATION
+from app.database.database import async_engine, replica_engines, pool_stats
+from app.hashing import password_hasher
+
+
+class Readiness:
+    """Готовность процесса принимать трафик: выставляется lifespan после прогрева."""
+
+    def __init__(self):
+        self.ready = False
+        self.phases: dict[str, float] = {}
+
+    def phase(self, name: str):
+        return _Phase(self, name)
+
+
+class _Phase:
+    def __init__(self, readiness: Readiness, name: str):
+        self.readiness = readiness
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.readiness.phases[self.name] = round((time.perf_counter() - self.started) * 1000, 1)
+
+
+readiness = Readiness()
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live", include_in_schema=False)
+async def live():
+    """Процесс жив и event loop отвечает."""
+    return {"status": "ok"}
+
+
+@router.get("/ready", include_in_schema=False)
+async def ready():
+    """Прогрев завершён и пул соединений не исчерпан."""
+    pools = {"primary": pool_stats(async_engine)}
+    for index, engine in enumerate(replica_engines):
+        pools[f"replica_{index}"] = pool_stats(engine)
+    saturated = [name for name, stats in pools.items() if stats.get("saturation", 0.0) >= HEALTH_MAX_POOL_SATURATION]
+
+    is_ready = readiness.ready and not saturated
+    hasher = password_hasher.stats()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ready" if is_ready else "not_ready",
+            "started": readiness.ready,
+            "saturated_pools": saturated,
+            "pools": pools,
+            "password_hasher": {"queue_depth": hasher["queue_depth"], "running": hasher["running"]},
+            "startup_ms": readiness.phases,
+        },
+    )
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Request, Response
+
+from app.config import JWKS_MAX_AGE
+from app.keys import key_ring
+
+
+router = APIRouter(tags=["jwks"])
+
+
+@router.get("/.well-known/jwks.json")
+async def get_jwks(request: Request):
+    """Открытые ключи для локальной проверки токенов другими сервисами."""
+    key_ring.maybe_reload()
+    headers = {
+        "Cache-Control": f"public, max-age={JWKS_MAX_AGE}",
+        "ETag": key_ring.jwks_etag,
+    }
+    if request.headers.get("if-none-match") == key_ring.jwks_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(key_ring.jwks, media_type="application/json", headers=headers)
@@ -0,0 +1,48 @@
+import hashlib
+from collections.abc import Iterable
+from datetime import datetime
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON через orjson без валидации response_model.
+
+    Только для данных, которые уже имеют форму ответа (строки из БД с
+    нужными колонками): FastAPI не проверяет Response, возвращённый из
+    обработчика. Datetime в UTC кодируются с "Z", как это делает pydantic.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+# Ответы зависят от пользователя и должны перепроверяться при каждом запросе
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def versions_etag(versions: Iterable[tuple[int, datetime]], more: bool = False) -> str:
+    """ETag набора строк по их (id, updated_at) и наличию следующей страницы."""
+    digest = hashlib.blake2b(digest_size=12)
+    for user_id, updated_at in versions:
+        digest.update(f"{user_id}:{updated_at.isoformat()};".encode())
+    digest.update(b"+" if more else b".")
+    return '"' + digest.hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL})
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, status, Depends, HTTPException
+from fastapi import APIRouter, status, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth import verify_password
+from app.auth import verify_password_async
 
 from app.database.crud import (
-    get_user_by_email,
     create_user,
     authenticate_user,
     update_user,
-    deactivate_user
+    deactivate_user,
+    get_password_hash,
+    revoke_refresh_token,
+    revoke_user_tokens,
+    get_user_profile,
+    get_user_updated_at,
+    EmailAlreadyExists
 )
 
 from app.schemas.users import (
@@ -21,18 +26,31 @@ from app.schemas.users import (
 )
 
 from app.database.users import User as UserModel
+from app.throttle import check_login_allowed, client_ip, record_login_result
+from app.activity import login_activity
 from app.database.db_depends import get_async_db
+from app.api.responses import (
+    FastJSONResponse,
+    PRIVATE_CACHE_CONTROL,
+    versions_etag,
+    etag_matches,
+    not_modified
+)
 
 from app.auth import (
     create_access_token,
     get_current_user,
-    create_refresh_token
+    create_refresh_token,
+    token_claims,
+    decode_token,
+    get_token_version
 )
+from app.revocation import revoked_refresh_tokens
+from app.shared_versions import shared_versions
 
+from datetime import datetime, timezone
 import jwt
 
-from app.config import SECRET_KEY, ALGORITHM
-
 
 router = APIRouter(prefix="/users",
                    tags=["users"])
@@ -48,19 +66,19 @@ async def register_user(
     user: UserCreate,
     db: AsyncSession = Depends(get_async_db)
 ):
-    if await get_user_by_email(db, user.email):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Email уже существует"
-        )
-
     if user.password != user.verf_password:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пароли не совпадают"
         )
 
-    return await create_user(db, user.model_dump())
+    try:
+        return await create_user(db, user.model_dump())
+    except EmailAlreadyExists:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email уже существует"
+        )
 
 
 
@@ -76,27 +94,36 @@ async def refresh_access_token(
     )
 
     try:
-        payload = jwt.decode(
-            refresh_token,
-            SECRET_KEY,
-            algorithms=[ALGORITHM]
-        )
-        email: str | None = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        payload = decode_token(refresh_token, cache=False)
     except jwt.PyJWTError:
         raise credentials_exception
 
-    user = await get_user_by_email(db, email)
-    if not user:
+    jti = payload.get("jti")
+    user_id = payload.get("id")
+    if payload.get("typ") != "refresh" or jti is None or user_id is None or payload.get("sub") is None:
         raise credentials_exception
 
-    access_token = create_access_token(
-        data={"sub": user.email, "role": user.role, "id": user.id}
-    )
+    # Повторное использование уже обменянного токена: токен мог быть украден,
+    # поэтому отзываются все токены пользователя
+    if jti in revoked_refresh_tokens:
+        await revoke_user_tokens(db, user_id)
+        raise credentials_exception
 
+    if shared_versions.rejects(user_id, payload.get("ver", 0)):
+        raise credentials_exception
+    if await get_token_version(db, user_id) != payload.get("ver", 0):
+        raise credentials_exception
+
+    expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+    if not await revoke_refresh_token(db, jti, user_id, expires_at):
+        await revoke_user_tokens(db, user_id)
+        raise credentials_exception
+    revoked_refresh_tokens.add(jti, payload["exp"])
+
+    claims = {key: payload[key] for key in ("sub", "role", "id", "ver") if key in payload}
     return {
-        "access_token": access_token,
+        "access_token": create_access_token(data=claims),
+        "refresh_token": create_refresh_token(data=claims),
         "token_type": "bearer"
     }
 
@@ -105,14 +132,20 @@ async def refresh_access_token(
 
 @router.post("/token")
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_async_db)
 ):
+    ip = client_ip(request)
+    check_login_allowed(form_data.username, ip)
+
     user = await authenticate_user(
         db,
         form_data.username,
         form_data.password
     )
+    record_login_result(form_data.username, ip, user is not None)
+    login_activity.record(form_data.username, user is not None)
 
     if not user:
         raise HTTPException(
@@ -122,28 +155,72 @@ async def login(
         )
 
     return {
-        "access_token": create_access_token(
-            data={"sub": user.email, "role": user.role, "id": user.id}
-        ),
-        "refresh_token": create_refresh_token(
-            data={"sub": user.email, "role": user.role, "id": user.id}
-        ),
+        "access_token": create_access_token(data=token_claims(user)),
+        "refresh_token": create_refresh_token(data=token_claims(user)),
         "token_type": "bearer",
     }
 
 
 
+@router.get(
+    "/me",
+    response_model=UserResponse,
+    response_class=FastJSONResponse,
+    status_code=status.HTTP_200_OK
+)
+async def get_account(
+    request: Request,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Профиль читается из БД, а не из кэша пользователей: ETag должен
+    # совпадать с тем, что видит проверка If-None-Match
+    if request.headers.get("if-none-match"):
+        updated_at = await get_user_updated_at(db, current_user.id)
+        if updated_at is not None:
+            etag = versions_etag([(current_user.id, updated_at)])
+            if etag_matches(request, etag):
+                return not_modified(etag)
+
+    profile = await get_user_profile(db, current_user.id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пользователь не найден"
+        )
+    return FastJSONResponse(
+        profile,
+        headers={
+            "ETag": versions_etag([(profile["id"], profile["updated_at"])]),
+            "Cache-Control": PRIVATE_CACHE_CONTROL
+        }
+    )
+
+
+
 @router.put("/me")
 async def update_account(
     data: UserUpdate,
     current_user: UserModel = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db)
 ):
-    await update_user(
-        db,
-        current_user,
-        data.model_dump(exclude_unset=True)
-    )
+    try:
+        updated = await update_user(
+            db,
+            current_user,
+            data.model_dump(exclude_unset=True)
+        )
+    except EmailAlreadyExists:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email уже существует"
+        )
+
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пользователь не найден"
+        )
 
     return {"message": "Вы успешно обновили свой аккаунт"}
 
@@ -155,7 +232,8 @@ async def delete_account(
     current_user: UserModel = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db)
 ):
-    if not verify_password(password.password, current_user.password_hash):
+    password_hash = await get_password_hash(db, current_user)
+    if not await verify_password_async(password.password, password_hash):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid password"
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Query, status
+
+from app.auth import get_current_role_admin
+from app.database.users import User as UserModel
+from app.watchdog import loop_watchdog
+
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"]
+)
+
+
+@router.get("/event-loop", status_code=status.HTTP_200_OK)
+async def get_event_loop_report(
+    limit: int | None = Query(None, ge=1, le=1000, description="Сколько записей вернуть (по умолчанию WATCHDOG_TOP_N)"),
+    current_admin: UserModel = Depends(get_current_role_admin)
+):
+    """Блокировки event loop по маршрутам и стекам, самые долгие в сумме — первыми."""
+    return loop_watchdog.report(limit)
+
+
+@router.delete("/event-loop", status_code=status.HTTP_200_OK)
+async def reset_event_loop_report(
+    current_admin: UserModel = Depends(get_current_role_admin)
+):
+    loop_watchdog.reset()
+    return {"message": "Статистика блокировок сброшена"}
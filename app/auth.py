@@ -1,42 +1,99 @@
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, timezone
+import hashlib
+import time
+import uuid
 import jwt
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.database.users import User as UserModel
-from app.config import SECRET_KEY, ALGORITHM
-from app.database.db_depends import get_async_db
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.config import STATELESS_AUTH
+from app.database.db_depends import get_async_db, release_connection
+from app.cache import user_cache, token_cache
+from app.keys import key_ring
+from app.shared_versions import shared_versions
+from app.metrics import timed
+from app.hashing import (
+    password_hasher,
+    hash_password,
+    verify_password,
+    verify_and_update_password
+)
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
 
+# Токены, подписанные удалённым ключом, не должны проходить проверку из кэша
+key_ring.on_reload.append(token_cache.clear)
+
+
+async def hash_password_async(password: str, block: bool = False) -> str:
+    return await password_hasher.run(hash_password, password, block=block)
+
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await password_hasher.run(verify_and_update_password, plain_password, hashed_password)
+
+
+def token_claims(user: UserModel) -> dict:
+    return {
+        "sub": user.email,
+        "role": user.role,
+        "id": user.id,
+        "ver": user.token_version
+    }
 
 
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # jti — уникальный идентификатор, по которому токен отзывается после использования
+    to_encode.update({"exp": expire, "typ": "refresh", "jti": uuid.uuid4().hex})
+    with timed("jwt"):
+        return key_ring.encode(to_encode)
 
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({"exp": expire, "typ": "access"})
+    with timed("jwt"):
+        return key_ring.encode(to_encode)
+
+
+def decode_token(token: str, cache: bool = True) -> dict:
+    """
+    jwt.decode с кэшем: повторная проверка того же токена — поиск в словаре.
+
+    Кэшируются только успешно проверенные токены и только до их exp.
+    Возвращаемый payload общий для всех запросов и не должен изменяться.
+    Refresh-токены одноразовые, их кэшировать незачем (cache=False).
+    """
+    if not cache:
+        with timed("jwt"):
+            return key_ring.decode(token)
+
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        if payload["exp"] <= time.time():
+            token_cache.pop(key)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return payload
+
+    with timed("jwt"):
+        payload = key_ring.decode(token)
+    exp = payload.get("exp")
+    if exp is not None:
+        token_cache.set(key, payload, ttl=exp - time.time())
+    return payload
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme),
@@ -47,9 +104,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme),
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
-        if email is None:
+        # Токены без typ выданы до появления refresh-ротации и считаются access
+        if email is None or payload.get("typ", "access") != "access":
             raise credentials_exception
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -59,14 +117,58 @@ async def get_current_user(token: str = Depends(oauth2_scheme),
         )
     except jwt.PyJWTError:
         raise credentials_exception
-    result = await db.scalars(
-        select(UserModel).where(UserModel.email == email, UserModel.is_active == True))
-    user = result.first()
+
+    # Токены, выданные до появления token_version, считаются версией 0
+    token_version = payload.get("ver", 0)
+
+    # Деактивация или отзыв в другом воркере этого узла видны сразу, без БД
+    user_id = payload.get("id")
+    if user_id is not None and shared_versions.rejects(user_id, token_version):
+        raise credentials_exception
+
+    if STATELESS_AUTH:
+        role = payload.get("role")
+        if user_id is None or role is None:
+            raise credentials_exception
+        version = await get_token_version(db, user_id)
+        await release_connection(db)
+        if version != token_version:
+            raise credentials_exception
+        return UserModel(id=user_id, email=email, role=role, token_version=token_version)
+
+    user = user_cache.get(email)
     if user is None:
+        generation = user_cache.generation
+        result = await db.scalars(
+            select(UserModel).where(UserModel.email == email, UserModel.is_active == True))
+        user = result.first()
+        # Обработчик может долго не обращаться к БД (bcrypt), соединение возвращается в пул
+        await release_connection(db)
+        if user is None:
+            raise credentials_exception
+        user_cache.set(user, generation)
+
+    if user.token_version != token_version:
         raise credentials_exception
     return user
 
 
+async def get_token_version(db: AsyncSession, user_id: int) -> int:
+    """Текущая версия токенов активного пользователя, -1 если его нет."""
+    version = user_cache.get_version(user_id)
+    if version is not None:
+        return version
+
+    generation = user_cache.generation
+    result = await db.scalars(
+        select(UserModel.token_version).where(UserModel.id == user_id, UserModel.is_active == True))
+    version = result.first()
+    if version is None:
+        version = -1
+    user_cache.set_version(user_id, version, generation)
+    return version
+
+
 async def get_current_role_admin(current_admin: UserModel = Depends(get_current_user)):
     if current_admin.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Доступ только администраторам")
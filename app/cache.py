@@ -0,0 +1,174 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from sqlalchemy import inspect
+
+from app.config import (
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+    TOKEN_VERSION_CACHE_TTL,
+    TOKEN_CACHE_SIZE
+)
+from app.database.users import User
+
+
+class TTLCache:
+    """
+    LRU-кэш с ограничением по размеру и времени жизни записей.
+
+    on_evict(key, value) вызывается для записей, удалённых самим кэшем
+    (вытеснение по размеру или истечение TTL), но не для pop и clear.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, on_evict: Callable[[Hashable, Any], None] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted_key, (_, evicted) = self._data.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def pop(self, key: Hashable) -> Any | None:
+        item = self._data.pop(key, None)
+        return None if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+_USER_FIELDS = tuple(attr.key for attr in inspect(User).column_attrs)
+
+
+class UserCache:
+    """
+    Кэш пользователей для get_current_user, ключ — email из токена.
+
+    Хранятся не ORM-объекты, а словари значений колонок: на каждое попадание
+    создаётся новый несвязанный с сессией User, поэтому изменения в одном
+    запросе не протекают в другие.
+
+    Снимки лежат в одном LRU по id пользователя, а email -> id — лишь индекс
+    к нему: запись вытесняется из обоих сразу, и invalidate по id всегда
+    находит снимок.
+
+    Для режима STATELESS_AUTH отдельно кэшируется token_version по id
+    пользователя (-1 — пользователь удалён или не существует).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, version_ttl: float):
+        self._users = TTLCache(maxsize, ttl, on_evict=self._evicted)
+        self._ids: dict[str, int] = {}
+        self._versions = TTLCache(maxsize, version_ttl)
+        self.generation = 0
+
+    def get(self, email: str) -> User | None:
+        user_id = self._ids.get(email)
+        if user_id is None:
+            self._users.misses += 1
+            return None
+        snapshot = self._users.get(user_id)
+        if snapshot is None:
+            return None
+        return User(**snapshot)
+
+    def set(self, user: User, generation: int):
+        # Пока шёл запрос в БД, пользователь мог быть изменён — такой
+        # результат уже устарел и кэшировать его нельзя
+        if generation != self.generation:
+            return
+        if self._users.maxsize <= 0 or self._users.ttl <= 0:
+            return
+        # Email мог смениться — старый ключ индекса не должен указывать на снимок
+        self._drop(user.id)
+        self._ids[user.email] = user.id
+        self._users.set(user.id, {key: getattr(user, key) for key in _USER_FIELDS})
+
+    def get_version(self, user_id: int) -> int | None:
+        return self._versions.get(user_id)
+
+    def set_version(self, user_id: int, version: int, generation: int):
+        if generation != self.generation:
+            return
+        self._versions.set(user_id, version)
+
+    def _evicted(self, user_id: int, snapshot: dict):
+        if self._ids.get(snapshot["email"]) == user_id:
+            del self._ids[snapshot["email"]]
+
+    def _drop(self, user_id: int):
+        snapshot = self._users.pop(user_id)
+        if snapshot is not None:
+            self._evicted(user_id, snapshot)
+
+    def invalidate(self, email: str | None = None, user_id: int | None = None):
+        self.generation += 1
+        if user_id is not None:
+            self._versions.pop(user_id)
+            self._drop(user_id)
+        if email is not None:
+            cached_id = self._ids.pop(email, None)
+            if cached_id is not None:
+                self._versions.pop(cached_id)
+                self._users.pop(cached_id)
+
+    def clear(self):
+        self.generation += 1
+        self._users.clear()
+        self._ids.clear()
+        self._versions.clear()
+
+    def stats(self) -> dict:
+        return {
+            "users": self._users.stats(),
+            "versions": self._versions.stats(),
+        }
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL, TOKEN_VERSION_CACHE_TTL)
+
+# Проверенные payload JWT по SHA-256 токена, TTL каждой записи задаётся по exp
+token_cache = TTLCache(TOKEN_CACHE_SIZE, 0)
@@ -3,4 +3,118 @@ from dotenv import load_dotenv
 
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
+# HS256 подписывает токены SECRET_KEY; RS256 и EdDSA — ключами из JWT_KEYS_DIR,
+# открытые части которых публикуются на /.well-known/jwks.json
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR") or None
+# Ключ для подписи; по умолчанию — последний по имени закрытый ключ в каталоге
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID") or None
+# Как часто проверять каталог ключей на изменения, секунды
+JWT_KEYS_RELOAD_INTERVAL = float(os.getenv("JWT_KEYS_RELOAD_INTERVAL", "60"))
+# В режиме RS256/EdDSA принимать токены без kid, подписанные HS256 и SECRET_KEY.
+# Только на время перехода: пока включено, SECRET_KEY позволяет выпустить любой токен
+JWT_ACCEPT_LEGACY_HS256 = os.getenv("JWT_ACCEPT_LEGACY_HS256", "false").lower() in ("1", "true", "yes")
+# Время кэширования JWKS у клиентов, секунды
+JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", "300"))
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Реплики только для чтения через запятую, запросы распределяются по кругу
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Сколько секунд не обращаться к недоступной реплике
+DATABASE_REPLICA_RETRY_AFTER = float(os.getenv("DATABASE_REPLICA_RETRY_AFTER", "30"))
+
+# Пул соединений
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Проверять только соединения, простоявшие в пуле дольше стольких секунд (0 — при каждой выдаче).
+# В режиме lazy запрос берёт соединение повторно через миллисекунды — пинговать его незачем
+DB_POOL_PRE_PING_IDLE = float(os.getenv("DB_POOL_PRE_PING_IDLE", "5"))
+# Кэш подготовленных выражений asyncpg (0 — выключить, нужно за pgbouncer в режиме transaction)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# "lazy" — сессия отдаёт соединение в пул перед bcrypt и после проверки токена,
+# "request" — держит его до конца запроса
+DB_SESSION_MODE = os.getenv("DB_SESSION_MODE", "lazy")
+# Сколько соединений открыть при старте, до первого запроса (0 — не прогревать)
+DB_POOL_WARM_SIZE = int(os.getenv("DB_POOL_WARM_SIZE", str(DB_POOL_SIZE)))
+# /health/ready отвечает 503, если занята большая доля пула (с overflow); больше 1 — не проверять
+HEALTH_MAX_POOL_SATURATION = float(os.getenv("HEALTH_MAX_POOL_SATURATION", "1"))
+
+# Пул для хэширования паролей: "process" или "thread"
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+
+# Политика хэширования: "bcrypt" или "argon2" (нужен пакет argon2-cffi).
+# Стоимость подбирается при старте так, чтобы хэш занимал не больше PASSWORD_HASH_TARGET_MS;
+# PASSWORD_HASH_ROUNDS (rounds bcrypt / time_cost argon2) отключает калибровку.
+# Хэши, не соответствующие политике, пересчитываются при успешном входе
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+# Границы калибровки, 0 — по умолчанию для схемы (bcrypt 10..16, argon2 1..10)
+PASSWORD_HASH_MIN_ROUNDS = int(os.getenv("PASSWORD_HASH_MIN_ROUNDS", "0"))
+PASSWORD_HASH_MAX_ROUNDS = int(os.getenv("PASSWORD_HASH_MAX_ROUNDS", "0"))
+PASSWORD_HASH_ARGON2_MEMORY_KIB = int(os.getenv("PASSWORD_HASH_ARGON2_MEMORY_KIB", "65536"))
+PASSWORD_HASH_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_HASH_ARGON2_PARALLELISM", "2"))
+
+# Кэш пользователей в get_current_user: размер 0 отключает кэш, TTL в секундах
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+# Авторизация только по подписанным claims токена, без загрузки пользователя.
+# Отзыв токенов проверяется по token_version, который кэшируется на TOKEN_VERSION_CACHE_TTL секунд
+STATELESS_AUTH = os.getenv("STATELESS_AUTH", "false").lower() in ("1", "true", "yes")
+TOKEN_VERSION_CACHE_TTL = float(os.getenv("TOKEN_VERSION_CACHE_TTL", "5"))
+
+# Кэш проверенных JWT: запись живёт ровно до exp токена, 0 отключает кэш
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# Массовые операции администратора: максимум элементов в запросе и размер пачки в одном SQL-запросе
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "50000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# Метрики на /metrics и заголовок Server-Timing в ответах
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+# Ограничение попыток входа до проверки пароля: по email и по IP клиента.
+# После LOCKOUT_THRESHOLD неудач подряд ключ блокируется на BASE * 2^n секунд, но не дольше MAX
+LOGIN_EMAIL_RATE_PER_MINUTE = float(os.getenv("LOGIN_EMAIL_RATE_PER_MINUTE", "10"))
+LOGIN_EMAIL_BURST = int(os.getenv("LOGIN_EMAIL_BURST", "5"))
+LOGIN_EMAIL_LOCKOUT_THRESHOLD = int(os.getenv("LOGIN_EMAIL_LOCKOUT_THRESHOLD", "5"))
+LOGIN_IP_RATE_PER_MINUTE = float(os.getenv("LOGIN_IP_RATE_PER_MINUTE", "60"))
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", "20"))
+LOGIN_IP_LOCKOUT_THRESHOLD = int(os.getenv("LOGIN_IP_LOCKOUT_THRESHOLD", "50"))
+LOGIN_LOCKOUT_BASE_SECONDS = float(os.getenv("LOGIN_LOCKOUT_BASE_SECONDS", "30"))
+LOGIN_LOCKOUT_MAX_SECONDS = float(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", "900"))
+LOGIN_THROTTLE_MAX_ENTRIES = int(os.getenv("LOGIN_THROTTLE_MAX_ENTRIES", "100000"))
+# Адреса и сети обратных прокси через запятую: для запросов от них IP клиента
+# берётся из X-Forwarded-For. Пусто — IP соединения (за прокси он у всех один)
+LOGIN_TRUSTED_PROXIES = [item.strip() for item in os.getenv("LOGIN_TRUSTED_PROXIES", "").split(",") if item.strip()]
+
+# Индекс отозванных refresh-токенов в памяти: размер Bloom-фильтра в битах, 0 — без фильтра
+REVOCATION_BLOOM_BITS = int(os.getenv("REVOCATION_BLOOM_BITS", "1048576"))
+
+# Таблица отозванных версий токенов в разделяемой памяти для нескольких воркеров на одном узле:
+# число слотов (0 — выключено, по 24 байта на слот) и имя сегмента в /dev/shm.
+# Сегмент переживает перезапуск воркеров; при пересоздании базы его нужно удалить
+SHARED_VERSIONS_SLOTS = int(os.getenv("SHARED_VERSIONS_SLOTS", "0"))
+SHARED_VERSIONS_NAME = os.getenv("SHARED_VERSIONS_NAME", "auth_token_versions")
+
+# Запись активности входа (last_login_at, счётчики входов и неудач) пачками в фоне:
+# интервал сброса в секундах, сброс раньше при BATCH_SIZE пользователях в буфере,
+# не больше MAX_PENDING пользователей в памяти
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "1"))
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+ACTIVITY_MAX_PENDING = int(os.getenv("ACTIVITY_MAX_PENDING", "100000"))
+
+# Обнаружение блокировок event loop (для staging): блокировки дольше THRESHOLD_MS
+# записываются со стеком и маршрутом, отчёт — GET /debug/event-loop (только администраторам)
+WATCHDOG_ENABLED = os.getenv("WATCHDOG_ENABLED", "false").lower() in ("1", "true", "yes")
+WATCHDOG_THRESHOLD_MS = float(os.getenv("WATCHDOG_THRESHOLD_MS", "100"))
+WATCHDOG_INTERVAL_MS = float(os.getenv("WATCHDOG_INTERVAL_MS", "20"))
+WATCHDOG_TOP_N = int(os.getenv("WATCHDOG_TOP_N", "20"))
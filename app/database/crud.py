@@ -1,34 +1,247 @@
+import asyncio
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import (
+    select, update, insert, delete, tuple_, func, or_, and_, bindparam, literal, literal_column,
+    table, column, DateTime
+)
 
-from app.database.users import User
-from app.auth import hash_password, verify_password
+from app.database.users import User, user_search_text
+from app.database.revoked_tokens import RevokedToken
+from app.database.db_depends import release_connection
+from app.auth import hash_password_async, verify_and_update_password_async
+from app.cache import user_cache
+from app.shared_versions import shared_versions, DEACTIVATED
+from app.config import BULK_CHUNK_SIZE
 
 from collections.abc import Sequence
 
 
-async def get_active_users(db: AsyncSession) -> Sequence[User]:
-    result = await db.scalars(
-        select(User).where(User.is_active == True)
-    )
-    return result.all()
+class EmailAlreadyExists(Exception):
+    """Email занят: нарушено уникальное ограничение users.email."""
+
+
+# Изменение этих полей отзывает все ранее выданные токены пользователя
+TOKEN_REVOKING_FIELDS = {"password_hash", "email", "role"}
+
+
+def _bump_token_version(data: dict, user: User | None = None) -> dict:
+    changed = set(data)
+    if user is not None and data.get("email") == user.email:
+        changed.discard("email")
+    if TOKEN_REVOKING_FIELDS & changed:
+        data["token_version"] = User.token_version + 1
+    return data
+
+
+# Колонки ответа списков: без password_hash и token_version, как в schemas.users.User
+USER_LIST_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.middle_name,
+    User.email,
+    User.role,
+    User.is_active,
+    User.created_at,
+    User.updated_at,
+)
+
+
+def encode_cursor(user: dict) -> str:
+    raw = json.dumps([user["created_at"].isoformat(), user["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, user_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(user_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _users_page_query(
+    columns: tuple,
+    is_active: bool,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    role: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None
+):
+    query = select(*columns).where(User.is_active == is_active)
+    if role is not None:
+        query = query.where(User.role == role)
+    if created_from is not None:
+        query = query.where(User.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(User.created_at < created_to)
+    if after is not None:
+        query = query.where(tuple_(User.created_at, User.id) > tuple_(*after))
+    return query.order_by(User.created_at, User.id).limit(limit + 1)
+
+
+async def get_users_page(
+    db: AsyncSession,
+    is_active: bool,
+    limit: int,
+    **filters
+) -> tuple[list[dict], str | None]:
+    """
+    Страница пользователей по возрастанию (created_at, id).
+
+    Keyset-пагинация: следующая страница начинается строго после последней
+    записи предыдущей, поэтому стоимость не зависит от номера страницы.
+    Возвращаются словари с колонками USER_LIST_COLUMNS, без ORM-объектов:
+    их можно сразу сериализовать в JSON.
+    """
+    result = await db.execute(_users_page_query(USER_LIST_COLUMNS, is_active, limit, **filters))
+    users = [dict(row) for row in result.mappings()]
+    if len(users) > limit:
+        users = users[:limit]
+        return users, encode_cursor(users[-1])
+    return users, None
+
+
+async def get_users_page_versions(
+    db: AsyncSession,
+    is_active: bool,
+    limit: int,
+    **filters
+) -> tuple[list[tuple[int, datetime]], bool]:
+    """
+    Те же строки, что вернёт get_users_page, но только (id, updated_at) и
+    признак следующей страницы — всё, из чего строится ETag страницы.
+    """
+    result = await db.execute(_users_page_query((User.id, User.updated_at), is_active, limit, **filters))
+    versions = [tuple(row) for row in result.all()]
+    return versions[:limit], len(versions) > limit
+
+
+def encode_search_cursor(rank: float, user_id: int) -> str:
+    raw = json.dumps([rank, user_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, user_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), int(user_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+SEARCH_MODES = ("prefix", "substring", "fuzzy")
+
+# FTS5-таблица поиска в SQLite, см. app.database.users
+users_search = table("users_search", column("rowid"))
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _search_filter(dialect: str, q: str, mode: str):
+    """Условие поиска и ранг (больше — лучше) для диалекта."""
+    q = q.lower()
+    if dialect == "sqlite":
+        if mode == "fuzzy":
+            # Нечёткий поиск: совпадение любой триграммы запроса, bm25 выше у строк с большим их числом
+            match = " OR ".join(dict.fromkeys(_fts_phrase(q[i:i + 3]) for i in range(len(q) - 2)))
+        else:
+            match = _fts_phrase(" " + q if mode == "prefix" else q)
+        fts = literal_column("users_search")
+        return fts.op("MATCH")(match), -func.bm25(fts)
+
+    if mode == "fuzzy":
+        condition = literal(q).op("<%")(user_search_text)
+    else:
+        pattern = ("% " if mode == "prefix" else "%") + _like_escape(q) + "%"
+        condition = user_search_text.like(pattern, escape="\\")
+    return condition, func.word_similarity(q, user_search_text)
+
+
+async def search_users(
+    db: AsyncSession,
+    q: str,
+    mode: str,
+    limit: int,
+    is_active: bool = True,
+    after: tuple[float, int] | None = None
+) -> tuple[list[dict], str | None]:
+    """
+    Поиск пользователей по имени, фамилии, отчеству и email.
+
+    prefix — совпадение с началом слова, substring — подстрока, fuzzy —
+    похожие строки (опечатки). Кандидатов отбирает триграммный индекс
+    (PostgreSQL — GIN по user_search_text, SQLite — FTS5 users_search),
+    сортируются они по рангу и id; курсор — ранг и id последней строки.
+    """
+    dialect = db.get_bind().dialect.name
+    condition, rank = _search_filter(dialect, q, mode)
+    query = select(*USER_LIST_COLUMNS, rank.label("rank")).where(condition, User.is_active == is_active)
+    if dialect == "sqlite":
+        query = query.join_from(User, users_search, users_search.c.rowid == User.id)
+    if after is not None:
+        query = query.where(or_(rank < after[0], and_(rank == after[0], User.id > after[1])))
+
+    result = await db.execute(query.order_by(rank.desc(), User.id).limit(limit + 1))
+    users = [dict(row) for row in result.mappings()]
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_search_cursor(users[-1]["rank"], users[-1]["id"])
+    for user in users:
+        del user["rank"]
+    return users, next_cursor
+
+
+async def get_active_users(db: AsyncSession, limit: int, **filters) -> tuple[list[dict], str | None]:
+    return await get_users_page(db, True, limit, **filters)
+
+
+async def get_active_users_versions(db: AsyncSession, limit: int, **filters) -> tuple[list[tuple[int, datetime]], bool]:
+    return await get_users_page_versions(db, True, limit, **filters)
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
+    """Активный пользователь по email без учёта регистра (индекс ix_users_active_email_lower)."""
     result = await db.scalars(
-        select(User).where(User.email == email, User.is_active == True)
+        select(User).where(func.lower(User.email) == email.lower(), User.is_active == True)
     )
     return result.first()
 
 
 async def create_user(db: AsyncSession, data: dict) -> User:
-    user = User(
-        **data,
-        password_hash=hash_password(data["password"])
-    )
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    """
+    Один INSERT ... RETURNING. Занятость email определяется по уникальному
+    ограничению, а не предварительным SELECT, поэтому гонка параллельных
+    регистраций тоже даёт EmailAlreadyExists, а не 500.
+    """
+    password = data.pop("password")
+    data.pop("verf_password", None)
+    try:
+        user = await db.scalar(
+            insert(User)
+            .values(**data, password_hash=await hash_password_async(password))
+            .returning(User)
+        )
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise EmailAlreadyExists(data["email"]) from exc
     return user
 
 
@@ -38,43 +251,100 @@ async def authenticate_user(
     password: str
 ) -> User | None:
     user = await get_user_by_email(db, email)
+    # Соединение не нужно, пока идёт проверка пароля; перехеширование возьмёт его снова
+    await release_connection(db)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    verified, new_hash = await verify_and_update_password_async(password, user.password_hash)
+    if not verified:
         return None
+    if new_hash is not None:
+        await rehash_password(db, user, new_hash)
     return user
 
 
+async def rehash_password(db: AsyncSession, user: User, new_hash: str):
+    """
+    Заменяет хэш, не соответствующий текущей политике. Пароль тот же,
+    поэтому token_version не меняется; если пароль успели сменить
+    параллельно, условие на старый хэш не даст его перезаписать.
+    """
+    await db.execute(
+        update(User)
+        .where(User.id == user.id, User.password_hash == user.password_hash)
+        # Профиль не меняется: updated_at и ETag остаются прежними
+        .values(password_hash=new_hash, updated_at=User.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    user_cache.invalidate(user_id=user.id)
+
+
 async def update_user(
     db: AsyncSession,
     user: User,
     data: dict
-):
-    if "password" in data:
-        data["password_hash"] = hash_password(data.pop("password"))
+) -> int | None:
+    # password: null — то же, что не передавать пароль
+    password = data.pop("password", None)
+    if password is not None:
+        data["password_hash"] = await hash_password_async(password)
 
-    await db.execute(
+    try:
+        result = await db.execute(
+            update(User)
+            .where(User.id == user.id, User.is_active == True)
+            .values(**_bump_token_version(data, user))
+            .returning(User.id, User.token_version)
+        )
+        row = result.first()
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise EmailAlreadyExists(data.get("email")) from exc
+    user_cache.invalidate(email=user.email, user_id=user.id)
+    if row is None:
+        return None
+    if "token_version" in data:
+        shared_versions.publish(row.id, row.token_version)
+    return row.id
+
+
+async def deactivate_user(db: AsyncSession, user_id: int) -> int | None:
+    user_id = await db.scalar(
         update(User)
-        .where(User.id == user.id)
-        .values(**data)
+        .where(User.id == user_id, User.is_active == True)
+        .values(is_active=False, token_version=User.token_version + 1)
+        .returning(User.id)
     )
     await db.commit()
+    if user_id is not None:
+        user_cache.invalidate(user_id=user_id)
+        shared_versions.publish(user_id, DEACTIVATED)
+    return user_id
 
 
-async def deactivate_user(db: AsyncSession, user_id: int):
-    await db.execute(
-        update(User)
-        .where(User.id == user_id)
-        .values(is_active=False)
+async def get_deleted_users(db: AsyncSession, limit: int, **filters) -> tuple[list[dict], str | None]:
+    return await get_users_page(db, False, limit, **filters)
+
+
+async def get_deleted_users_versions(db: AsyncSession, limit: int, **filters) -> tuple[list[tuple[int, datetime]], bool]:
+    return await get_users_page_versions(db, False, limit, **filters)
+
+
+async def get_user_profile(db: AsyncSession, user_id: int) -> dict | None:
+    """Активный пользователь с колонками USER_LIST_COLUMNS."""
+    result = await db.execute(
+        select(*USER_LIST_COLUMNS).where(User.id == user_id, User.is_active == True)
     )
-    await db.commit()
+    row = result.mappings().first()
+    return dict(row) if row is not None else None
 
 
-async def get_deleted_users(db: AsyncSession):
-    result = await db.scalars(
-        select(User).where(User.is_active == False)
+async def get_user_updated_at(db: AsyncSession, user_id: int) -> datetime | None:
+    return await db.scalar(
+        select(User.updated_at).where(User.id == user_id, User.is_active == True)
     )
-    return result.all()
 
 
 async def get_user_by_id(db: AsyncSession, user_id: int):
@@ -84,21 +354,240 @@ async def get_user_by_id(db: AsyncSession, user_id: int):
     return result.first()
 
 
-async def update_user_by_id(db: AsyncSession, user_id: int, data: dict):
-    await db.execute(
+async def get_password_hash(db: AsyncSession, user: User) -> str | None:
+    # В режиме STATELESS_AUTH текущий пользователь собран из токена без хэша пароля
+    if user.password_hash is not None:
+        return user.password_hash
+    result = await db.scalars(
+        select(User.password_hash).where(User.id == user.id)
+    )
+    password_hash = result.first()
+    # Хэш нужен для bcrypt: держать соединение на время проверки незачем
+    await release_connection(db)
+    return password_hash
+
+
+async def update_user_by_id(db: AsyncSession, user_id: int, data: dict) -> int | None:
+    """Возвращает id обновлённого пользователя или None, если его нет."""
+    result = await db.execute(
         update(User)
         .where(User.id == user_id)
-        .values(**data)
+        .values(**_bump_token_version(data))
+        .returning(User.id, User.token_version)
     )
+    row = result.first()
     await db.commit()
+    if row is None:
+        return None
+    user_cache.invalidate(user_id=row.id)
+    if "token_version" in data:
+        shared_versions.publish(row.id, row.token_version)
+    return row.id
 
 
-async def deactivate_user_by_id(db: AsyncSession, user_id: int):
-    await db.execute(
+async def deactivate_user_by_id(db: AsyncSession, user_id: int) -> int | None:
+    """Возвращает id деактивированного пользователя или None, если его нет или он уже удалён."""
+    user_id = await db.scalar(
+        update(User)
+        .where(User.id == user_id, User.is_active == True)
+        .values(is_active=False, token_version=User.token_version + 1)
+        .returning(User.id)
+    )
+    await db.commit()
+    if user_id is not None:
+        user_cache.invalidate(user_id=user_id)
+        shared_versions.publish(user_id, DEACTIVATED)
+    return user_id
+
+
+# Один UPDATE на пользователя, выполняется как executemany:
+# p_keep = 0 сбрасывает счётчик неудач (был успешный вход), 1 — прибавляет к нему
+_users = User.__table__
+LOGIN_ACTIVITY_UPDATE = (
+    update(_users)
+    .where(func.lower(_users.c.email) == bindparam("p_email"), _users.c.is_active == True)
+    .values(
+        login_count=_users.c.login_count + bindparam("p_logins"),
+        failed_login_count=_users.c.failed_login_count * bindparam("p_keep") + bindparam("p_failures"),
+        last_login_at=func.coalesce(bindparam("p_last_login_at", type_=DateTime(timezone=True)), _users.c.last_login_at),
+        # Активность входа не входит в профиль, ETag не меняется
+        updated_at=_users.c.updated_at,
+    )
+)
+
+
+async def apply_login_activity(db: AsyncSession, rows: list[dict]):
+    """
+    Применяет накопленную активность входа: строки с ключами p_email (в
+    нижнем регистре), p_logins, p_failures, p_keep, p_last_login_at.
+    """
+    for chunk in _chunks(rows):
+        await db.execute(LOGIN_ACTIVITY_UPDATE, chunk)
+    await db.commit()
+
+
+async def revoke_refresh_token(db: AsyncSession, jti: str, user_id: int, expires_at: datetime) -> bool:
+    """
+    Сохраняет использованный refresh-токен. False — токен уже был отозван
+    (в том числе другим процессом): это повторное использование.
+    """
+    try:
+        await db.execute(insert(RevokedToken).values(jti=jti, user_id=user_id, expires_at=expires_at))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return False
+    return True
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int) -> int | None:
+    """Отзывает все токены пользователя увеличением token_version."""
+    result = await db.execute(
         update(User)
         .where(User.id == user_id)
-        .values(is_active=False)
+        .values(token_version=User.token_version + 1)
+        .returning(User.id, User.token_version)
     )
+    row = result.first()
+    await db.commit()
+    if row is None:
+        return None
+    user_cache.invalidate(user_id=row.id)
+    shared_versions.publish(row.id, row.token_version)
+    return row.id
+
+
+async def get_revoked_tokens(db: AsyncSession, now: datetime) -> Sequence[tuple[str, datetime]]:
+    result = await db.execute(
+        select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now))
+    return result.all()
+
+
+async def delete_expired_revoked_tokens(db: AsyncSession, now: datetime) -> int:
+    result = await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    await db.commit()
+    return result.rowcount
+
+
+def _dialect_insert(db: AsyncSession, model):
+    """INSERT с ON CONFLICT для диалекта сессии (PostgreSQL или SQLite)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def _chunks(items: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def deactivate_users_bulk(db: AsyncSession, user_ids: list[int]) -> set[int]:
+    """Деактивирует пользователей пачками в одной транзакции, возвращает id деактивированных."""
+    deactivated = set()
+    for chunk in _chunks(list(dict.fromkeys(user_ids))):
+        result = await db.execute(
+            update(User)
+            .where(User.id.in_(chunk), User.is_active == True)
+            .values(is_active=False, token_version=User.token_version + 1)
+            .returning(User.id)
+        )
+        deactivated.update(result.scalars())
+    await db.commit()
+    for user_id in deactivated:
+        user_cache.invalidate(user_id=user_id)
+        shared_versions.publish(user_id, DEACTIVATED)
+    return deactivated
+
+
+async def update_users_bulk(db: AsyncSession, items: list[dict]) -> set[int]:
+    """
+    Обновляет пользователей по id, возвращает id обновлённых; отсутствующие
+    в БД пропускаются, при повторе id действует последний элемент.
+
+    Пользователи с одинаковыми значениями обновляются одним
+    UPDATE ... WHERE id IN (...) на пачку, остальные — executemany по
+    первичному ключу.
+    """
+    groups: dict[tuple, list[int]] = {}
+    payloads = {item["id"]: tuple(sorted((key, value) for key, value in item.items() if key != "id")) for item in items}
+    for user_id, values in payloads.items():
+        groups.setdefault(values, []).append(user_id)
+
+    updated = set()
+    single = []
+    for values, user_ids in groups.items():
+        if len(user_ids) == 1:
+            single.append({"id": user_ids[0], **dict(values)})
+            continue
+        for chunk in _chunks(user_ids):
+            result = await db.scalars(
+                update(User).where(User.id.in_(chunk)).values(**dict(values)).returning(User.id)
+            )
+            updated.update(result)
+
+    for chunk in _chunks(single):
+        result = await db.scalars(
+            select(User.id).where(User.id.in_([item["id"] for item in chunk]))
+        )
+        existing = set(result.all())
+        rows = [item for item in chunk if item["id"] in existing]
+        if rows:
+            await db.execute(update(User), rows)
+        updated |= existing
     await db.commit()
+    for user_id in updated:
+        user_cache.invalidate(user_id=user_id)
+    return updated
+
 
+async def import_users_bulk(db: AsyncSession, rows: list[dict]) -> dict[str, int | None]:
+    """
+    Создаёт пользователей многострочными INSERT пачками в одной транзакции.
 
+    Пароли хэшируются в пуле хэширования до первого запроса к БД: соединение
+    занято только на время SELECT и INSERT, а не минутами bcrypt. Хэши
+    строк с занятым email при этом пропадают — конфликты при импорте редки.
+    Возвращает словарь email -> id, где None означает, что email уже занят.
+    """
+    await release_connection(db)
+    hashes: list[str] = []
+    for chunk in _chunks(rows):
+        hashes.extend(await asyncio.gather(
+            *(hash_password_async(row["password"], block=True) for row in chunk)
+        ))
+
+    created: dict[str, int | None] = {}
+    for chunk in _chunks(list(zip(rows, hashes))):
+        emails = [row["email"] for row, _ in chunk]
+        # Email занят, если совпадает у любого пользователя (уникальный индекс
+        # ix_users_email) или без учёта регистра у активного (ix_users_active_email_lower)
+        result = await db.execute(
+            select(User.email, User.is_active).where(or_(
+                User.email.in_(emails),
+                and_(func.lower(User.email).in_([email.lower() for email in emails]), User.is_active == True)
+            ))
+        )
+        taken, taken_lower = set(), set()
+        for email, is_active in result.all():
+            taken.add(email)
+            if is_active:
+                taken_lower.add(email.lower())
+        values = []
+        for row, password_hash in chunk:
+            if row["email"] in taken or row["email"].lower() in taken_lower:
+                created[row["email"]] = None
+            else:
+                values.append({
+                    **{key: value for key, value in row.items() if key != "password"},
+                    "password_hash": password_hash
+                })
+
+        if values:
+            # Email могли занять между SELECT и INSERT (регистрация в другом
+            # запросе): такие строки пропускаются и считаются конфликтом
+            statement = _dialect_insert(db, User).on_conflict_do_nothing()
+            result = await db.execute(statement.returning(User.id, User.email), values)
+            inserted = {email: user_id for user_id, email in result.all()}
+            created.update({row["email"]: inserted.get(row["email"]) for row in values})
+    await db.commit()
+    return created
@@ -1,15 +1,190 @@
-import os
-from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import asyncio
+import itertools
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase
 
-load_dotenv()
+from app.config import (
+    DATABASE_URL,
+    DATABASE_REPLICA_URLS,
+    DATABASE_REPLICA_RETRY_AFTER,
+    DB_ECHO,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_POOL_PRE_PING_IDLE,
+    DB_STATEMENT_CACHE_SIZE
+)
+
+
+def ping_idle_connections(engine: AsyncEngine, idle: float):
+    """
+    pre-ping только для соединений, пролежавших в пуле дольше `idle` секунд.
+    Неответившее соединение отбрасывается, и пул выдаёт другое.
+    """
+    @event.listens_for(engine.sync_engine, "checkin")
+    def checkin(dbapi_connection, record):
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def checkout(dbapi_connection, record, proxy):
+        checked_in_at = record.info.pop("checked_in_at", None)
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle:
+            return
+        try:
+            alive = engine.dialect.do_ping(dbapi_connection)
+        except Exception as exc:
+            raise DisconnectionError() from exc
+        if not alive:
+            raise DisconnectionError()
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """Создаёт движок с настройками пула из конфигурации."""
+    parsed = make_url(url)
+    options = {
+        "echo": DB_ECHO,
+        "pool_pre_ping": DB_POOL_PRE_PING and DB_POOL_PRE_PING_IDLE <= 0,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    # Для SQLite в памяти используется StaticPool без размеров пула
+    if parsed.get_backend_name() != "sqlite" or parsed.database not in (None, "", ":memory:"):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    if parsed.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    engine = create_async_engine(url, **options)
+    if DB_POOL_PRE_PING and DB_POOL_PRE_PING_IDLE > 0:
+        ping_idle_connections(engine, DB_POOL_PRE_PING_IDLE)
+    return engine
+
+
+async def warm_pool(engine: AsyncEngine, size: int) -> int:
+    """
+    Открывает `size` соединений одновременно и возвращает их в пул, чтобы
+    первые запросы после старта не тратили время на подключение к БД.
+    """
+    pool_size = getattr(engine.pool, "size", None)
+    if pool_size is not None:
+        size = min(size, pool_size())
+
+    async def connect():
+        conn = await engine.connect().start()
+        try:
+            await conn.execute(text("SELECT 1"))
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    results = await asyncio.gather(*(connect() for _ in range(size)), return_exceptions=True)
+    for result in results:
+        if not isinstance(result, BaseException):
+            await result.close()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return size
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Заполненность пула; saturation — доля занятых соединений от максимума с overflow."""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+    size = pool.size()
+    capacity = size + max(0, getattr(pool, "_max_overflow", 0))
+    checked_out = pool.checkedout()
+    return {
+        "size": size,
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": max(0, pool.overflow()),
+        "saturation": checked_out / capacity if capacity else 0.0,
+    }
+
+
+def create_session_maker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """Ошибка связи с сервером БД, а не ошибка самого запроса."""
+    if isinstance(exc, OSError):
+        return True
+    return isinstance(exc, DBAPIError) and (
+        exc.connection_invalidated or isinstance(exc, (OperationalError, InterfaceError))
+    )
+
+
+class ReadSessionRouter:
+    """
+    Выдаёт сессии для запросов только на чтение.
+
+    Реплики перебираются по кругу. Сессия не берёт соединение заранее:
+    запрос, которому хватает кэша, не трогает ни реплику, ни её пул. Если
+    запрос к реплике падает из-за связи с ней, реплика исключается на
+    DATABASE_REPLICA_RETRY_AFTER секунд, после чего проверяется фоновым
+    SELECT 1 и возвращается в работу только при успехе. При недоступности
+    всех реплик сессия открывается на основной базе.
+    """
+
+    def __init__(self, primary: async_sessionmaker[AsyncSession],
+                 replicas: list[async_sessionmaker[AsyncSession]], retry_after: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self._next = itertools.cycle(range(len(replicas)))
+        self._down_until: dict[int, float] = {}
+        self._probes: dict[int, asyncio.Task] = {}
+
+    def session(self) -> AsyncSession:
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            index = next(self._next)
+            if index in self._down_until:
+                if self._down_until[index] <= now and index not in self._probes:
+                    self._probes[index] = asyncio.create_task(self._probe(index))
+                continue
+            return self.replicas[index](info={"replica": index})
+        return self.primary()
+
+    def failed(self, session: AsyncSession, exc: BaseException):
+        """Исключает реплику сессии, если запрос упал из-за связи с ней."""
+        index = session.info.get("replica")
+        if index is not None and is_connection_error(exc):
+            self._down_until[index] = time.monotonic() + self.retry_after
+
+    async def _probe(self, index: int):
+        try:
+            async with self.replicas[index]() as session:
+                await session.execute(text("SELECT 1"))
+        except (DBAPIError, OSError):
+            self._down_until[index] = time.monotonic() + self.retry_after
+        else:
+            self._down_until.pop(index, None)
+        finally:
+            del self._probes[index]
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-async_engine = create_async_engine(DATABASE_URL, echo=True)
+async_engine = create_engine(DATABASE_URL)
+replica_engines = [create_engine(url) for url in DATABASE_REPLICA_URLS]
 
-async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+async_session_maker = create_session_maker(async_engine)
+read_session_router = ReadSessionRouter(
+    async_session_maker,
+    [create_session_maker(engine) for engine in replica_engines],
+    DATABASE_REPLICA_RETRY_AFTER
+)
 
 
 class Base(DeclarativeBase):
@@ -1,9 +1,35 @@
 from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.database import async_session_maker
+from app.config import DB_SESSION_MODE
+from app.database.database import async_session_maker, read_session_router
 
 
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сессия для списков и поиска: реплика, если настроена, иначе основная база.
+    Проверки токенов и всё, что должно видеть только что записанное, читают
+    основную базу — реплика может отставать.
+    """
+    async with read_session_router.session() as session:
+        try:
+            yield session
+        except Exception as exc:
+            read_session_router.failed(session, exc)
+            raise
+
+
+async def release_connection(session: AsyncSession):
+    """
+    В режиме DB_SESSION_MODE=lazy завершает транзакцию сессии и возвращает
+    соединение в пул — перед bcrypt и другой долгой работой без БД. Сессия
+    остаётся открытой: следующий запрос возьмёт соединение заново, а
+    загруженные объекты не сбрасываются (expire_on_commit=False).
+    """
+    if DB_SESSION_MODE == "lazy" and session.in_transaction():
+        await session.commit()
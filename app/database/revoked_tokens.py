@@ -0,0 +1,14 @@
+from sqlalchemy import Integer, String, DateTime
+
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+
+from app.database.database import Base
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True, comment="Идентификатор refresh-токена")
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False, comment="Владелец токена")
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True, comment="Когда токен истекает и запись можно удалить")
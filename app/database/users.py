@@ -1,17 +1,21 @@
 from sqlalchemy import (
-    Integer, String, Text, Boolean, DateTime
+    Integer, String, Text, Boolean, DateTime, Index, DDL, func, event, literal
 )
 
 from sqlalchemy.orm import Mapped, mapped_column
-from datetime import datetime
+from datetime import datetime, timezone
 
 from app.database.database import Base
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class User(Base):
     __tablename__ = "users"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, comment="Уникальный идентификатор пользователя")
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, comment="Уникальный идентификатор пользователя")
     first_name: Mapped[str] = mapped_column(String(50), nullable=False, comment="Имя пользователя")
     last_name: Mapped[str] = mapped_column(String(50), nullable=False, comment="Фамилия пользователя")
     middle_name: Mapped[str] = mapped_column(String(50), nullable=False, comment="Отчество пользователя")
@@ -20,6 +24,72 @@ class User(Base):
 
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, comment="Активен ли пользователь")
     role: Mapped[str] = mapped_column(String, default="user", comment="Роль пользователя")
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", comment="Версия токенов, увеличивается при их отзыве")
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.now,  comment="Дата и время создания пользователя")
+    # Меняется при каждом изменении полей профиля (onupdate срабатывает и для update() в crud.py), из неё строится ETag
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_utcnow, onupdate=_utcnow, server_default=func.now(), comment="Дата и время последнего изменения профиля")
+
+    # Обновляются пачками фоновым app.activity, а не в обработчике входа
+    last_login_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, comment="Дата и время последнего успешного входа")
+    login_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", comment="Число успешных входов")
+    failed_login_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", comment="Неудачных попыток входа подряд с последнего успешного")
+
+    __table_args__ = (
+        # Keyset-пагинация админских списков: WHERE is_active [AND role] ORDER BY created_at, id
+        # INCLUDE updated_at: ETag страницы считается index-only сканированием
+        Index("ix_users_is_active_created_at_id", "is_active", "created_at", "id", postgresql_include=["updated_at"]),
+        Index("ix_users_is_active_role_created_at_id", "is_active", "role", "created_at", "id", postgresql_include=["updated_at"]),
+    )
+
+
+# Поиск активного пользователя по email без учёта регистра (вход, проверка
+# занятости email). Частичный индекс не содержит удалённых пользователей и
+# запрещает двух активных пользователей с email, различающимся только регистром
+Index(
+    "ix_users_active_email_lower",
+    func.lower(User.email),
+    unique=True,
+    postgresql_where=User.is_active,
+    sqlite_where=User.is_active == True,
+)
 
+
+# Текст для поиска администратором: все поля через пробел и с пробелом в
+# начале, поэтому поиск по началу слова — это поиск подстроки " <запрос>"
+_SPACE = literal(" ", String, literal_execute=True)
+user_search_text = func.lower(
+    _SPACE + User.first_name + _SPACE + User.last_name + _SPACE + User.middle_name + _SPACE + User.email
+)
+
+# PostgreSQL: триграммный GIN-индекс по тексту поиска, его используют LIKE '%...%'
+# и оператор нечёткого поиска <%
+event.listen(
+    User.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+Index(
+    "ix_users_search_trgm",
+    user_search_text.label("search_text"),
+    postgresql_using="gin",
+    postgresql_ops={"search_text": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+# SQLite (локальная разработка): тот же текст в FTS5-таблице с триграммным
+# токенизатором, rowid = users.id, синхронизируется триггерами
+USERS_SEARCH_SQLITE_TEXT = "' ' || {0}.first_name || ' ' || {0}.last_name || ' ' || {0}.middle_name || ' ' || {0}.email"
+USERS_SEARCH_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE users_search USING fts5(search_text, tokenize='trigram')",
+    "CREATE TRIGGER users_search_insert AFTER INSERT ON users BEGIN "
+    f"INSERT INTO users_search(rowid, search_text) VALUES (new.id, {USERS_SEARCH_SQLITE_TEXT.format('new')}); END",
+    "CREATE TRIGGER users_search_update AFTER UPDATE OF first_name, last_name, middle_name, email ON users BEGIN "
+    f"UPDATE users_search SET search_text = {USERS_SEARCH_SQLITE_TEXT.format('new')} WHERE rowid = new.id; END",
+    "CREATE TRIGGER users_search_delete AFTER DELETE ON users BEGIN "
+    "DELETE FROM users_search WHERE rowid = old.id; END",
+)
+for statement in USERS_SEARCH_SQLITE_DDL:
+    event.listen(User.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    User.__table__, "after_drop",
+    DDL("DROP TABLE IF EXISTS users_search").execute_if(dialect="sqlite")
+)
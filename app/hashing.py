@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.hash import argon2
+
+from app.config import (
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE_SIZE,
+    PASSWORD_HASH_SCHEME,
+    PASSWORD_HASH_ROUNDS,
+    PASSWORD_HASH_TARGET_MS,
+    PASSWORD_HASH_MIN_ROUNDS,
+    PASSWORD_HASH_MAX_ROUNDS,
+    PASSWORD_HASH_ARGON2_MEMORY_KIB,
+    PASSWORD_HASH_ARGON2_PARALLELISM
+)
+from app.metrics import record
+
+logger = logging.getLogger(__name__)
+
+# Границы стоимости по умолчанию: (минимум, максимум) rounds для bcrypt и time_cost для argon2
+DEFAULT_ROUNDS_RANGE = {"bcrypt": (10, 16), "argon2": (1, 10)}
+
+
+@dataclass(frozen=True)
+class HashPolicy:
+    """Параметры хэширования, с которыми создаются новые хэши."""
+    scheme: str
+    rounds: int
+    memory_cost: int | None = None
+    parallelism: int | None = None
+    # Измеренное время одного хэширования при калибровке, мс
+    hash_ms: float | None = None
+
+
+def build_context(policy: HashPolicy) -> CryptContext:
+    """
+    CryptContext для политики: хэши другой схемы или с меньшей стоимостью
+    по-прежнему проверяются, но needs_update для них возвращает True.
+    """
+    schemes = [policy.scheme] + [
+        scheme for scheme in ("bcrypt", "argon2")
+        if scheme != policy.scheme and (scheme != "argon2" or argon2.has_backend())
+    ]
+    options = {
+        f"{policy.scheme}__rounds": policy.rounds,
+        f"{policy.scheme}__min_rounds": policy.rounds,
+    }
+    if policy.scheme == "argon2":
+        options.update(argon2__memory_cost=policy.memory_cost, argon2__parallelism=policy.parallelism)
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+def default_policy() -> HashPolicy:
+    """Политика без калибровки: PASSWORD_HASH_ROUNDS или нижняя граница диапазона."""
+    scheme = PASSWORD_HASH_SCHEME
+    if scheme not in DEFAULT_ROUNDS_RANGE:
+        raise ValueError(f"Unknown password hash scheme: {scheme}")
+    if scheme == "argon2" and not argon2.has_backend():
+        raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requires the argon2-cffi package")
+    min_rounds = PASSWORD_HASH_MIN_ROUNDS or DEFAULT_ROUNDS_RANGE[scheme][0]
+    rounds = PASSWORD_HASH_ROUNDS or max(min_rounds, 12 if scheme == "bcrypt" else 2)
+    if scheme == "argon2":
+        return HashPolicy(scheme, rounds, PASSWORD_HASH_ARGON2_MEMORY_KIB, PASSWORD_HASH_ARGON2_PARALLELISM)
+    return HashPolicy(scheme, rounds)
+
+
+def _measure(policy: HashPolicy, samples: int = 2) -> float:
+    context = build_context(policy)
+    best = float("inf")
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("calibration-password")
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def calibrate_policy(target_ms: float = PASSWORD_HASH_TARGET_MS) -> HashPolicy:
+    """
+    Подбирает максимальную стоимость, при которой одно хэширование
+    укладывается в target_ms на этой машине.
+
+    bcrypt: время удваивается с каждым раундом, поэтому достаточно одного
+    замера на нижней границе. argon2: время растёт линейно по time_cost при
+    фиксированной памяти. Если PASSWORD_HASH_ROUNDS задан явно, калибровка
+    не выполняется — так стоимость одинакова на всех инстансах.
+    """
+    policy = default_policy()
+    if PASSWORD_HASH_ROUNDS:
+        return HashPolicy(**{**asdict(policy), "hash_ms": _measure(policy, samples=1)})
+
+    min_rounds, max_rounds = DEFAULT_ROUNDS_RANGE[policy.scheme]
+    min_rounds = PASSWORD_HASH_MIN_ROUNDS or min_rounds
+    max_rounds = PASSWORD_HASH_MAX_ROUNDS or max_rounds
+
+    policy = HashPolicy(**{**asdict(policy), "rounds": min_rounds})
+    elapsed = _measure(policy)
+    rounds = min_rounds
+    if policy.scheme == "bcrypt":
+        while rounds < max_rounds and elapsed * 2 <= target_ms:
+            rounds += 1
+            elapsed *= 2
+    else:
+        rounds = max(min_rounds, min(max_rounds, int(target_ms / elapsed * min_rounds)))
+
+    policy = HashPolicy(**{**asdict(policy), "rounds": rounds})
+    return HashPolicy(**{**asdict(policy), "hash_ms": _measure(policy, samples=1)})
+
+
+current_policy = default_policy()
+pwd_context = build_context(current_policy)
+
+
+def configure(policy: HashPolicy):
+    """Применяет политику в текущем процессе; также initializer для процессов пула."""
+    global current_policy, pwd_context
+    current_policy = policy
+    pwd_context = build_context(policy)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def load_backend() -> str:
+    """Загружает backend схемы (bcrypt/argon2), иначе это происходит при первом входе."""
+    return pwd_context.handler().get_backend()
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Проверка пароля и, если хэш не соответствует политике, новый хэш — за один вызов в пуле."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt в отдельном пуле, чтобы не блокировать event loop.
+
+    Одновременно в пуле выполняется не больше `workers` задач, остальные
+    ждут в очереди длиной `queue_size`. При переполнении очереди запрос
+    отклоняется с 503, а не копится в памяти.
+
+    Фоновые задачи (`block=True`) идут отдельной полосой: в общую очередь
+    одновременно попадает не больше `workers` из них, и в длину очереди,
+    по которой отклоняются входы и регистрации, они не входят.
+    """
+
+    def __init__(self, kind: str, workers: int, queue_size: int):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown password hash executor: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self._executor: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._bulk_slots: asyncio.Semaphore | None = None
+        self._waiting = 0
+        self._bulk_waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # Процессы пула не видят configure() родителя, политика передаётся явно
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=configure,
+                    initargs=(current_policy,)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        return self._slots
+
+    def _get_bulk_slots(self) -> asyncio.Semaphore:
+        if self._bulk_slots is None:
+            self._bulk_slots = asyncio.Semaphore(self.workers)
+        return self._bulk_slots
+
+    async def run(self, fn, *args, block: bool = False):
+        """
+        Выполняет `fn(*args)` в пуле.
+
+        При `block=True` ограничение очереди не проверяется — используется
+        фоновыми задачами (импорт, сидирование), которым лучше подождать,
+        чем получить отказ.
+        """
+        if block:
+            bulk_slots = self._get_bulk_slots()
+            self._bulk_waiting += 1
+            try:
+                await bulk_slots.acquire()
+            finally:
+                self._bulk_waiting -= 1
+            try:
+                return await self._run(fn, args, queued=False)
+            finally:
+                bulk_slots.release()
+
+        if self._waiting >= self.queue_size:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис перегружен, попробуйте позже",
+                headers={"Retry-After": "1"},
+            )
+        return await self._run(fn, args, queued=True)
+
+    async def _run(self, fn, args: tuple, queued: bool):
+        slots = self._get_slots()
+        queued_at = time.perf_counter()
+        self._waiting += queued
+        try:
+            await slots.acquire()
+        finally:
+            self._waiting -= queued
+
+        started_at = time.perf_counter()
+        wait = started_at - queued_at
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            run_time = time.perf_counter() - started_at
+            self._running -= 1
+            self._completed += 1
+            self._run_total += run_time
+            record("hash", run_time)
+            slots.release()
+
+    async def warm_up(self) -> int:
+        """Запускает все процессы/потоки пула и загружает в них backend хэширования."""
+        await asyncio.gather(*(self.run(load_backend, block=True) for _ in range(self.workers)))
+        return self.workers
+
+    def apply_policy(self, policy: HashPolicy):
+        """Меняет политику; уже запущенные процессы пула пересоздаются при следующем вызове."""
+        configure(policy)
+        if self.kind == "process" and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self._waiting,
+            "bulk_queue_depth": self._bulk_waiting,
+            "running": self._running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "wait_seconds_total": self._wait_total,
+            "wait_seconds_max": self._wait_max,
+            "wait_seconds_avg": self._wait_total / self._completed if self._completed else 0.0,
+            "run_seconds_total": self._run_total,
+            "policy": {
+                "rounds": current_policy.rounds,
+                "hash_ms": current_policy.hash_ms or 0.0,
+            },
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._slots = None
+        self._bulk_slots = None
+
+
+password_hasher = PasswordHasher(
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE_SIZE
+)
@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+from app.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    JWT_KEYS_DIR,
+    JWT_ACTIVE_KID,
+    JWT_KEYS_RELOAD_INTERVAL,
+    JWT_ACCEPT_LEGACY_HS256
+)
+
+HMAC_ALGORITHM = "HS256"
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    algorithm: str
+    public_key: object
+    private_key: object | None = None
+
+
+def _algorithm_for(key) -> str:
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    raise ValueError(f"Unsupported key type: {type(key).__name__}")
+
+
+def _jwk(key: SigningKey) -> dict:
+    encoder = RSAAlgorithm if key.algorithm == "RS256" else OKPAlgorithm
+    jwk = encoder.to_jwk(key.public_key, as_dict=True)
+    jwk.update({"kid": key.kid, "alg": key.algorithm, "use": "sig"})
+    return jwk
+
+
+def load_keys(directory: Path) -> dict[str, SigningKey]:
+    """
+    Ключи из каталога: <kid>.pem — закрытый ключ (подписывает и проверяет),
+    <kid>.pub.pem — только открытый ключ выведенного из оборота ключа, которым
+    ещё проверяются выданные им токены.
+    """
+    keys = {}
+    for path in sorted(directory.glob("*.pem")):
+        data = path.read_bytes()
+        if path.name.endswith(".pub.pem"):
+            kid = path.name[:-len(".pub.pem")]
+            public_key = serialization.load_pem_public_key(data)
+            keys.setdefault(kid, SigningKey(kid, _algorithm_for(public_key), public_key))
+        else:
+            kid = path.stem
+            private_key = serialization.load_pem_private_key(data, password=None)
+            keys[kid] = SigningKey(kid, _algorithm_for(private_key), private_key.public_key(), private_key)
+    return keys
+
+
+class KeyRing:
+    """
+    Ключи подписи JWT, разобранные один раз и хранящиеся в памяти.
+
+    В режиме HS256 токены подписываются SECRET_KEY, как и раньше. В режиме
+    RS256/EdDSA токен подписывается активным ключом и получает kid в
+    заголовке; проверка выбирает открытый ключ по kid, а алгоритм берётся из
+    ключа, а не из токена. Токены без kid в этом режиме отклоняются: иначе
+    SECRET_KEY остаётся способом подделать токен. На время перехода их можно
+    принимать с `accept_legacy` (JWT_ACCEPT_LEGACY_HS256) — тогда они
+    проверяются SECRET_KEY, и пользователи не разлогиниваются.
+
+    Каталог ключей перечитывается, если изменился и прошло не меньше
+    `reload_interval` секунд, или если пришёл токен с неизвестным kid
+    (ключ повернул другой процесс). После перечитывания вызываются
+    подписчики `on_reload` — например, очистка кэша проверенных токенов.
+    """
+
+    def __init__(self, algorithm: str, directory: str | None, active_kid: str | None,
+                 reload_interval: float, accept_legacy: bool = False):
+        if algorithm not in (HMAC_ALGORITHM, "RS256", "EdDSA"):
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        if algorithm != HMAC_ALGORITHM and not directory:
+            raise ValueError("JWT_KEYS_DIR is required for asymmetric JWT algorithms")
+        self.algorithm = algorithm
+        self.directory = Path(directory) if directory else None
+        self.active_kid = active_kid
+        self.reload_interval = reload_interval
+        self.accept_legacy = algorithm == HMAC_ALGORITHM or accept_legacy
+        self.keys: dict[str, SigningKey] = {}
+        self.active: SigningKey | None = None
+        self.jwks = b'{"keys":[]}'
+        self.jwks_etag = '"' + hashlib.sha256(self.jwks).hexdigest()[:16] + '"'
+        self._mtime = None
+        self._checked_at = 0.0
+        self.reloads = 0
+        self.on_reload: list = []
+
+    def load(self):
+        if self.directory is None:
+            return
+        self._checked_at = time.monotonic()
+        self._mtime = self.directory.stat().st_mtime_ns
+        keys = load_keys(self.directory)
+
+        active = None
+        if self.algorithm != HMAC_ALGORITHM:
+            signing = [key for key in keys.values() if key.private_key is not None and key.algorithm == self.algorithm]
+            if self.active_kid is not None:
+                active = keys.get(self.active_kid)
+                if active is None or active.private_key is None:
+                    raise ValueError(f"Active JWT key {self.active_kid} not found in {self.directory}")
+            elif signing:
+                # Без явного JWT_ACTIVE_KID активен последний по имени ключ,
+                # поэтому kid удобно называть по дате выпуска
+                active = signing[-1]
+            else:
+                raise ValueError(f"No {self.algorithm} private keys in {self.directory}")
+
+        self.keys, self.active = keys, active
+        self.jwks = json.dumps({"keys": [_jwk(key) for key in keys.values()]}, separators=(",", ":")).encode()
+        self.jwks_etag = '"' + hashlib.sha256(self.jwks).hexdigest()[:16] + '"'
+        self.reloads += 1
+        for callback in self.on_reload:
+            callback()
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        if self.directory is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+        if self._mtime is not None and self.directory.stat().st_mtime_ns == self._mtime:
+            return False
+        self.load()
+        return True
+
+    def encode(self, payload: dict) -> str:
+        if self.algorithm == HMAC_ALGORITHM:
+            return jwt.encode(payload, SECRET_KEY, algorithm=HMAC_ALGORITHM)
+        self.maybe_reload()
+        return jwt.encode(payload, self.active.private_key, algorithm=self.active.algorithm,
+                          headers={"kid": self.active.kid})
+
+    def decode(self, token: str) -> dict:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            if not self.accept_legacy or not SECRET_KEY:
+                raise jwt.InvalidTokenError("Token has no kid")
+            return jwt.decode(token, SECRET_KEY, algorithms=[HMAC_ALGORITHM])
+
+        key = self.keys.get(kid)
+        # Проверка каталога — один stat, перечитывается он только если изменился
+        if key is None and self.maybe_reload(force=True):
+            key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError("Unknown kid")
+        return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+
+    def stats(self) -> dict:
+        return {"keys": len(self.keys), "reloads": self.reloads}
+
+
+key_ring = KeyRing(ALGORITHM, JWT_KEYS_DIR, JWT_ACTIVE_KID, JWT_KEYS_RELOAD_INTERVAL, JWT_ACCEPT_LEGACY_HS256)
+
+
+def generate_key(algorithm: str):
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Выпуск нового ключа подписи JWT")
+    parser.add_argument("--dir", default=JWT_KEYS_DIR, required=JWT_KEYS_DIR is None, help="каталог ключей")
+    parser.add_argument("--alg", default=ALGORITHM if ALGORITHM != HMAC_ALGORITHM else "EdDSA",
+                        choices=("RS256", "EdDSA"))
+    parser.add_argument("--kid", default=None, help="идентификатор ключа, по умолчанию — текущее время")
+    parser.add_argument("--retire", nargs="*", default=[],
+                        help="kid ключей, которые больше не подписывают, но ещё проверяют токены")
+    return parser.parse_args(argv)
+
+
+def main(args):
+    directory = Path(args.dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    kid = args.kid or time.strftime("%Y%m%d%H%M%S")
+    private_key = generate_key(args.alg)
+    path = directory / f"{kid}.pem"
+    path.write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ))
+    os.chmod(path, 0o600)
+    print(f"Создан ключ {kid} ({args.alg}): {path}")
+
+    for retired in args.retire:
+        retired_path = directory / f"{retired}.pem"
+        key = serialization.load_pem_private_key(retired_path.read_bytes(), password=None)
+        (directory / f"{retired}.pub.pem").write_bytes(key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        ))
+        retired_path.unlink()
+        print(f"Ключ {retired} выведен из оборота, оставлен только открытый ключ")
+
+
+if __name__ == "__main__":
+    main(parse_args())
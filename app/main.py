@@ -1,11 +1,114 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
 from fastapi import FastAPI
 
-from app.api import users, admin
+from app.api import users, admin, metrics, jwks, health, watchdog
+from app.api.health import readiness
+from app.auth import create_access_token, decode_token
+from app.hashing import password_hasher, calibrate_policy
+from app.keys import key_ring
+from app.cache import user_cache, token_cache
+from app.throttle import email_throttle, ip_throttle
+from app.revocation import revoked_refresh_tokens
+from app.shared_versions import shared_versions
+from app.activity import login_activity
+from app.watchdog import loop_watchdog, WatchdogMiddleware
+from app.database.crud import get_revoked_tokens, delete_expired_revoked_tokens
+from app.database.database import async_engine, replica_engines, async_session_maker, warm_pool, pool_stats
+from app.config import METRICS_ENABLED, METRICS_SERVER_TIMING, DB_POOL_WARM_SIZE, WATCHDOG_ENABLED
+from app.metrics import MetricsMiddleware, instrument_engine, register_collector
+
+# Логгер uvicorn, чтобы сообщения при старте попадали в тот же вывод
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Всё, что иначе происходило бы при первых запросах, делается до приёма
+    # трафика; /health/ready отвечает 200 только после этого
+    with readiness.phase("total"):
+        # Ключи подписи разбираются один раз; ошибка в каталоге ключей не даст приложению стартовать
+        with readiness.phase("jwt_keys"):
+            key_ring.load()
+            claims = {"sub": "warm-up", "role": "user", "id": 0, "ver": 0}
+            decode_token(create_access_token(claims), cache=False)
+
+        # Стоимость хэширования подбирается под CPU этой машины, в отдельном потоке
+        with readiness.phase("hash_calibration"):
+            policy = await asyncio.to_thread(calibrate_policy)
+            password_hasher.apply_policy(policy)
+        logger.info("Password hashing policy: %s rounds=%d (%.0f ms per hash)",
+                    policy.scheme, policy.rounds, policy.hash_ms)
+
+        with readiness.phase("hash_pool"):
+            await password_hasher.warm_up()
+
+        with readiness.phase("db_pool"):
+            for engine in (async_engine, *replica_engines):
+                await warm_pool(engine, DB_POOL_WARM_SIZE)
 
-app = FastAPI()
+        with readiness.phase("shared_versions"):
+            shared_versions.open()
+
+        # Индекс отозванных refresh-токенов живёт в памяти и восстанавливается из таблицы
+        with readiness.phase("revocation_index"):
+            now = datetime.now(timezone.utc)
+            async with async_session_maker() as session:
+                await delete_expired_revoked_tokens(session, now)
+                rows = await get_revoked_tokens(session, now)
+            revoked_refresh_tokens.load(
+                (jti, expires_at.replace(tzinfo=expires_at.tzinfo or timezone.utc).timestamp())
+                for jti, expires_at in rows
+            )
+
+    logger.info("Startup finished in %.0f ms: %s", readiness.phases["total"],
+                ", ".join(f"{name}={ms:.0f}ms" for name, ms in readiness.phases.items() if name != "total"))
+    login_activity.start()
+    if WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    readiness.ready = True
+    yield
+    readiness.ready = False
+    await loop_watchdog.stop()
+    # Дописываем накопленную активность входа, пока пул соединений ещё открыт
+    await login_activity.stop()
+    shared_versions.close()
+    password_hasher.shutdown()
+    for engine in (async_engine, *replica_engines):
+        await engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(users.router)
 app.include_router(admin.router)
+app.include_router(jwks.router)
+app.include_router(health.router)
+
+if METRICS_ENABLED:
+    for engine in (async_engine, *replica_engines):
+        instrument_engine(engine)
+    register_collector("password_hasher", password_hasher.stats)
+    register_collector("user_cache", user_cache.stats)
+    register_collector("token_cache", token_cache.stats)
+    register_collector("login_throttle_email", email_throttle.stats)
+    register_collector("login_throttle_ip", ip_throttle.stats)
+    register_collector("revoked_refresh_tokens", revoked_refresh_tokens.stats)
+    register_collector("jwt_keys", key_ring.stats)
+    register_collector("db_pool", lambda: pool_stats(async_engine))
+    register_collector("shared_versions", shared_versions.stats)
+    register_collector("login_activity", login_activity.stats)
+    app.add_middleware(MetricsMiddleware, server_timing=METRICS_SERVER_TIMING)
+    app.include_router(metrics.router)
+
+# Отчёт о блокировках event loop: включается только на staging и при поиске регрессий
+if WATCHDOG_ENABLED:
+    app.add_middleware(WatchdogMiddleware, watchdog=loop_watchdog)
+    app.include_router(watchdog.router)
+    register_collector("event_loop", loop_watchdog.stats)
 
 
 @app.get("/")
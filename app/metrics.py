@@ -0,0 +1,248 @@
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        result, total = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((repr(bound), total))
+        result.append(("+Inf", self.count))
+        return result
+
+
+@dataclass
+class RequestTimings:
+    """Что потратил один запрос: заполняется хуками БД, хэширования и JWT."""
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    hash_seconds: float = 0.0
+    jwt_seconds: float = 0.0
+    pool_checkouts: int = 0
+    pool_hold_seconds: float = 0.0
+
+
+@dataclass
+class RouteStats:
+    latency: Histogram
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    hash_seconds: float = 0.0
+    jwt_seconds: float = 0.0
+    pool_checkouts: int = 0
+    pool_hold_seconds: float = 0.0
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar("current_timings", default=None)
+
+_routes: dict[tuple[str, str, int], RouteStats] = {}
+_totals = {"db": [0, 0.0], "hash": [0, 0.0], "jwt": [0, 0.0], "pool_hold": [0, 0.0]}
+# Дополнительные источники метрик (пул хэширования, кэши): name -> callable() -> dict
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def record(kind: str, seconds: float):
+    """
+    Учитывает время операции kind ("db", "hash", "jwt", "pool_hold" — сколько
+    соединение было взято из пула) в общем счётчике и в текущем запросе.
+    """
+    total = _totals[kind]
+    total[0] += 1
+    total[1] += seconds
+
+    timings = current_timings.get()
+    if timings is None:
+        return
+    if kind == "db":
+        timings.db_queries += 1
+        timings.db_seconds += seconds
+    elif kind == "hash":
+        timings.hash_seconds += seconds
+    elif kind == "jwt":
+        timings.jwt_seconds += seconds
+    elif kind == "pool_hold":
+        timings.pool_checkouts += 1
+        timings.pool_hold_seconds += seconds
+
+
+class timed:
+    """Контекстный менеджер: with timed("jwt"): ..."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.kind, time.perf_counter() - self.started)
+
+
+def register_collector(name: str, collect: Callable[[], dict]):
+    _collectors[name] = collect
+
+
+def instrument_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+
+    # Время начала хранится в контексте выполнения, а не в соединении: при
+    # ошибке запроса after_cursor_execute не вызывается, и список в
+    # conn.info рос бы, сдвигая пары начала и конца следующих запросов
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        if started is not None:
+            record("db", time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        started = getattr(exception_context.execution_context, "query_started", None)
+        if started is not None:
+            record("db", time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            record("pool_hold", time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время ответа по маршрутам и разбивка по БД, bcrypt и JWT.
+
+    Маршрут берётся из шаблона пути (/admins/{user_id}), а не из самого
+    пути, чтобы число серий не росло с числом пользователей.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    total = (time.perf_counter() - started) * 1000
+                    value = (
+                        f"db;dur={timings.db_seconds * 1000:.2f};desc=\"{timings.db_queries} queries\", "
+                        f"hash;dur={timings.hash_seconds * 1000:.2f}, "
+                        f"jwt;dur={timings.jwt_seconds * 1000:.2f}, "
+                        f"pool;dur={timings.pool_hold_seconds * 1000:.2f}, "
+                        f"app;dur={total:.2f}"
+                    )
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timings.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            key = (scope["method"], path, status_code)
+            stats = _routes.get(key)
+            if stats is None:
+                stats = _routes[key] = RouteStats(Histogram())
+            stats.latency.observe(time.perf_counter() - started)
+            stats.db_queries += timings.db_queries
+            stats.db_seconds += timings.db_seconds
+            stats.hash_seconds += timings.hash_seconds
+            stats.jwt_seconds += timings.jwt_seconds
+            stats.pool_checkouts += timings.pool_checkouts
+            stats.pool_hold_seconds += timings.pool_hold_seconds
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def render() -> str:
+    """Метрики в текстовом формате Prometheus."""
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, path, code), stats in sorted(_routes.items()):
+        labels = _labels(method=method, route=path, status=code)
+        for bound, count in stats.latency.cumulative():
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.latency.sum}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats.latency.count}")
+
+    for name, attr, help_text in (
+        ("http_request_db_queries_total", "db_queries", "DB queries issued by route"),
+        ("http_request_db_seconds_total", "db_seconds", "Time spent in DB queries by route"),
+        ("http_request_password_hash_seconds_total", "hash_seconds", "Time spent in bcrypt by route"),
+        ("http_request_jwt_seconds_total", "jwt_seconds", "Time spent encoding/decoding JWT by route"),
+        ("http_request_pool_checkouts_total", "pool_checkouts", "DB connections checked out by route"),
+        ("http_request_pool_hold_seconds_total", "pool_hold_seconds", "Time DB connections were held by route"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (method, path, code), stats in sorted(_routes.items()):
+            lines.append(f"{name}{{{_labels(method=method, route=path, status=code)}}} {getattr(stats, attr)}")
+
+    for kind, (count, seconds) in _totals.items():
+        lines.append(f"# TYPE {kind}_operations_total counter")
+        lines.append(f"{kind}_operations_total {count}")
+        lines.append(f"# TYPE {kind}_seconds_total counter")
+        lines.append(f"{kind}_seconds_total {seconds}")
+
+    for prefix, collect in _collectors.items():
+        for name, value in _flatten(collect()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"{prefix}_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    for name, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{name}_")
+        else:
+            yield f"{prefix}{name}", value
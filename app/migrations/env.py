@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 
 from app.database.database import Base
 from app.database.users import User
+from app.database.revoked_tokens import RevokedToken
 
 
 load_dotenv()
@@ -31,12 +32,23 @@ if config.config_file_name is not None:
 
 target_metadata = Base.metadata
 
+# Объекты поиска создаются миграцией d3f8a1c6e250 сырым SQL: таблица FTS5
+# users_search с теневыми users_search_* (SQLite) и GIN-индекс по выражению
+# с gin_trgm_ops (PostgreSQL), который autogenerate не умеет сравнить
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and name.startswith("users_search"):
+        return False
+    if type_ == "index" and name == "ix_users_search_trgm":
+        return False
+    return True
+
 
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -46,7 +58,7 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
     with context.begin_transaction():
         context.run_migrations()
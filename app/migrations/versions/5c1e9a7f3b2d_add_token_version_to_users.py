@@ -0,0 +1,28 @@
+"""add token_version to users
+
+Revision ID: 5c1e9a7f3b2d
+Revises: 7d6061397b22
+Create Date: 2026-10-18 10:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7f3b2d'
+down_revision: Union[str, Sequence[str], None] = '7d6061397b22'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False, comment='Версия токенов, увеличивается при их отзыве'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
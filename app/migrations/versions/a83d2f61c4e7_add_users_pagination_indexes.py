@@ -0,0 +1,30 @@
+"""add users pagination indexes
+
+Revision ID: a83d2f61c4e7
+Revises: 5c1e9a7f3b2d
+Create Date: 2026-10-18 11:03:27.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a83d2f61c4e7'
+down_revision: Union[str, Sequence[str], None] = '5c1e9a7f3b2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_is_active_created_at_id', 'users', ['is_active', 'created_at', 'id'], unique=False)
+    op.create_index('ix_users_is_active_role_created_at_id', 'users', ['is_active', 'role', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_is_active_role_created_at_id', table_name='users')
+    op.drop_index('ix_users_is_active_created_at_id', table_name='users')
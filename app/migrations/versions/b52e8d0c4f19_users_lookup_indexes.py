@@ -0,0 +1,36 @@
+"""users lookup indexes
+
+Revision ID: b52e8d0c4f19
+Revises: e41b7c09d5a3
+Create Date: 2026-10-18 15:42:10.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e8d0c4f19'
+down_revision: Union[str, Sequence[str], None] = 'e41b7c09d5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Если среди активных пользователей есть email, различающиеся только регистром,
+    # создание уникального индекса упадёт — такие записи нужно объединить заранее
+    op.create_index(
+        'ix_users_active_email_lower', 'users', [sa.text('lower(email)')], unique=True,
+        postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active = 1')
+    )
+    # Дублирует индекс первичного ключа
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.drop_index('ix_users_active_email_lower', table_name='users')
@@ -0,0 +1,32 @@
+"""add login activity to users
+
+Revision ID: c7a4e2b91d06
+Revises: b52e8d0c4f19
+Create Date: 2026-10-18 17:20:45.913402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a4e2b91d06'
+down_revision: Union[str, Sequence[str], None] = 'b52e8d0c4f19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('last_login_at', sa.DateTime(timezone=True), nullable=True, comment='Дата и время последнего успешного входа'))
+    op.add_column('users', sa.Column('login_count', sa.Integer(), server_default='0', nullable=False, comment='Число успешных входов'))
+    op.add_column('users', sa.Column('failed_login_count', sa.Integer(), server_default='0', nullable=False, comment='Неудачных попыток входа подряд с последнего успешного'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'failed_login_count')
+    op.drop_column('users', 'login_count')
+    op.drop_column('users', 'last_login_at')
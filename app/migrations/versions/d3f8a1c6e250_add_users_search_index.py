@@ -0,0 +1,57 @@
+"""add users search index
+
+Revision ID: d3f8a1c6e250
+Revises: c7a4e2b91d06
+Create Date: 2026-10-18 19:05:12.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8a1c6e250'
+down_revision: Union[str, Sequence[str], None] = 'c7a4e2b91d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_TEXT = "' ' || {0}first_name || ' ' || {0}last_name || ' ' || {0}middle_name || ' ' || {0}email"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # На большой таблице построение индекса блокирует запись в users;
+        # при необходимости его можно заранее создать вручную с CONCURRENTLY
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(
+            f"CREATE INDEX ix_users_search_trgm ON users USING gin (lower({SEARCH_TEXT.format('')}) gin_trgm_ops)"
+        )
+    elif op.get_bind().dialect.name == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE users_search USING fts5(search_text, tokenize='trigram')")
+        op.execute(f"INSERT INTO users_search(rowid, search_text) SELECT id, {SEARCH_TEXT.format('')} FROM users")
+        op.execute(
+            "CREATE TRIGGER users_search_insert AFTER INSERT ON users BEGIN "
+            f"INSERT INTO users_search(rowid, search_text) VALUES (new.id, {SEARCH_TEXT.format('new.')}); END"
+        )
+        op.execute(
+            "CREATE TRIGGER users_search_update AFTER UPDATE OF first_name, last_name, middle_name, email ON users BEGIN "
+            f"UPDATE users_search SET search_text = {SEARCH_TEXT.format('new.')} WHERE rowid = new.id; END"
+        )
+        op.execute(
+            "CREATE TRIGGER users_search_delete AFTER DELETE ON users BEGIN "
+            "DELETE FROM users_search WHERE rowid = old.id; END"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_users_search_trgm', table_name='users')
+    elif op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('users_search_insert', 'users_search_update', 'users_search_delete'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS users_search')
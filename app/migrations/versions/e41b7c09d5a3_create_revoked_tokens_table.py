@@ -0,0 +1,35 @@
+"""create revoked_tokens table
+
+Revision ID: e41b7c09d5a3
+Revises: a83d2f61c4e7
+Create Date: 2026-10-18 13:41:09.665130
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b7c09d5a3'
+down_revision: Union[str, Sequence[str], None] = 'a83d2f61c4e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('revoked_tokens',
+    sa.Column('jti', sa.String(length=32), nullable=False, comment='Идентификатор refresh-токена'),
+    sa.Column('user_id', sa.Integer(), nullable=False, comment='Владелец токена'),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False, comment='Когда токен истекает и запись можно удалить'),
+    sa.PrimaryKeyConstraint('jti')
+    )
+    op.create_index(op.f('ix_revoked_tokens_expires_at'), 'revoked_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_revoked_tokens_expires_at'), table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
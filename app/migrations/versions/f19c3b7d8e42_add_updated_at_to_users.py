@@ -0,0 +1,40 @@
+"""add updated_at to users
+
+Revision ID: f19c3b7d8e42
+Revises: d3f8a1c6e250
+Create Date: 2026-10-18 20:31:48.217650
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19c3b7d8e42'
+down_revision: Union[str, Sequence[str], None] = 'd3f8a1c6e250'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False, comment='Дата и время последнего изменения профиля'))
+    op.execute('UPDATE users SET updated_at = created_at WHERE created_at IS NOT NULL')
+    if op.get_bind().dialect.name == 'postgresql':
+        # Индексы пагинации с INCLUDE updated_at: ETag страницы без чтения таблицы
+        op.drop_index('ix_users_is_active_created_at_id', table_name='users')
+        op.drop_index('ix_users_is_active_role_created_at_id', table_name='users')
+        op.create_index('ix_users_is_active_created_at_id', 'users', ['is_active', 'created_at', 'id'], unique=False, postgresql_include=['updated_at'])
+        op.create_index('ix_users_is_active_role_created_at_id', 'users', ['is_active', 'role', 'created_at', 'id'], unique=False, postgresql_include=['updated_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_users_is_active_role_created_at_id', table_name='users')
+        op.drop_index('ix_users_is_active_created_at_id', table_name='users')
+        op.create_index('ix_users_is_active_created_at_id', 'users', ['is_active', 'created_at', 'id'], unique=False)
+        op.create_index('ix_users_is_active_role_created_at_id', 'users', ['is_active', 'role', 'created_at', 'id'], unique=False)
+    op.drop_column('users', 'updated_at')
@@ -0,0 +1,92 @@
+import hashlib
+import heapq
+import time
+
+from app.config import REVOCATION_BLOOM_BITS
+
+
+class BloomFilter:
+    """Битовый Bloom-фильтр: быстрый отрицательный ответ без обращения к словарю."""
+
+    def __init__(self, bits: int, hashes: int = 4):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.hashes).digest()
+        for index in range(self.hashes):
+            yield int.from_bytes(digest[index * 8:(index + 1) * 8], "little") % self.bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def clear(self):
+        self._array = bytearray(len(self._array))
+
+
+class RevocationIndex:
+    """
+    Отозванные refresh-токены в памяти: jti -> время истечения.
+
+    Куча по времени истечения позволяет удалять истёкшие записи за
+    O(log n) каждую, не просматривая весь словарь. Истёкший токен и так не
+    пройдёт проверку подписи, поэтому хранить его дальше незачем.
+    Bloom-фильтр (если задан размер) отвечает «точно не отозван» без
+    обращения к словарю и перестраивается после очистки.
+    """
+
+    def __init__(self, bloom_bits: int = 0):
+        self._expires: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._bloom = BloomFilter(bloom_bits) if bloom_bits > 0 else None
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def __contains__(self, jti: str) -> bool:
+        if self._bloom is not None and jti not in self._bloom:
+            return False
+        expires_at = self._expires.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def add(self, jti: str, expires_at: float):
+        self.prune()
+        self._expires[jti] = expires_at
+        heapq.heappush(self._heap, (expires_at, jti))
+        if self._bloom is not None:
+            self._bloom.add(jti)
+
+    def load(self, rows):
+        """Пересобирает индекс из пар (jti, expires_at) при старте приложения."""
+        self.clear()
+        for jti, expires_at in rows:
+            self.add(jti, expires_at)
+
+    def prune(self, now: float | None = None):
+        now = time.time() if now is None else now
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, jti = heapq.heappop(self._heap)
+            self._expires.pop(jti, None)
+            removed += 1
+        if removed and self._bloom is not None and removed * 4 >= len(self._expires):
+            self._bloom.clear()
+            for jti in self._expires:
+                self._bloom.add(jti)
+
+    def clear(self):
+        self._expires.clear()
+        self._heap.clear()
+        if self._bloom is not None:
+            self._bloom.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._expires)}
+
+
+revoked_refresh_tokens = RevocationIndex(REVOCATION_BLOOM_BITS)
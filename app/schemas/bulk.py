@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field, EmailStr
+
+from app.config import BULK_MAX_ITEMS
+from app.schemas.users import UserUpdateAdmin
+
+
+class UserImport(BaseModel):
+    first_name: str = Field(..., max_length=50, description="Имя пользователя")
+    last_name: str = Field(..., max_length=50, description="Фамилия Пользователя")
+    middle_name: str = Field(max_length=50, description="Отчество Пользователя (если есть)")
+    email: EmailStr = Field(max_length=250, description="Email пользователя")
+    password: str = Field(min_length=4, description="Пароль (минимум 4 символов)")
+    role: str = Field(default="user", pattern="^(user|admin)$", description="Роль: 'user' или 'admin'")
+
+
+class BulkDeactivate(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS, description="id пользователей")
+    password: str = Field(min_length=4, description="Пароль администратора")
+
+
+class UserUpdateAdminItem(UserUpdateAdmin):
+    id: int = Field(..., description="id пользователя")
+
+
+class BulkUpdate(BaseModel):
+    items: list[UserUpdateAdminItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkItemResult(BaseModel):
+    id: int | None = None
+    email: str | None = None
+    line: int | None = Field(None, description="Номер строки в загруженном файле")
+    status: str = Field(..., description="deactivated, updated, created, not_found, duplicate, conflict или invalid")
+    detail: str | None = None
+
+
+class BulkResult(BaseModel):
+    results: list[BulkItemResult]
+    summary: dict[str, int]
@@ -12,10 +12,16 @@ class User(BaseModel):
     role: str
     is_active: bool
     created_at: datetime
+    updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserPage(BaseModel):
+    items: list[User]
+    next_cursor: str | None = Field(None, description="Курсор следующей страницы, null если это последняя")
+
+
 class UserCreate(BaseModel):
     first_name: str = Field(..., max_length=50, description="Имя пользователя")
     last_name: str = Field(..., max_length=50, description="Фамилия Пользователя")
@@ -31,7 +37,7 @@ class UserUpdate(BaseModel):
     last_name: str = Field(..., max_length=50, description="Фамилия Пользователя")
     middle_name: str = Field(max_length=50, description="Отчество Пользователя (если есть)")
     email: EmailStr = Field(max_length=250, description="Email пользователя")
-    password_hash: str = Field(min_length=4, description="Пароль (минимум 4 символов)")
+    password: str | None = Field(default=None, min_length=4, description="Новый пароль (минимум 4 символов, если меняется)")
 
 
 class UserUpdateAdmin(BaseModel):
@@ -1,11 +1,16 @@
+import argparse
 import asyncio
-from passlib.context import CryptContext
-from sqlalchemy import select
+import random
+import string
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, func
 
 from app.database.database import async_engine, async_session_maker, Base
 from app.database.users import User
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.hashing import PasswordHasher, hash_password
+from app.config import PASSWORD_HASH_WORKERS
 
 users_data = [
     {"first_name": "Александр", "last_name": "Иванов", "middle_name": "Петрович", "email": "alex.ivanov@example.com", "password": "4821", "role": "admin", "is_active": True},
@@ -25,6 +30,12 @@ users_data = [
     {"first_name": "Максим", "last_name": "Никитин", "middle_name": "Артемович", "email": "maksim.nikitin@example.com", "password": "9084", "role": "user", "is_active": True}
 ]
 
+# Пулы для генерации: (имя, латиница для email) берём из тестовых пользователей
+FIRST_NAMES = [(u["first_name"], u["email"].split(".")[0]) for u in users_data]
+LAST_NAMES = [(u["last_name"], u["email"].split("@")[0].split(".")[1]) for u in users_data]
+MIDDLE_NAMES = [u["middle_name"] for u in users_data]
+
+
 async def seed():
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -35,9 +46,16 @@ async def seed():
             print("Users already exist — skipping seed.")
             return
 
+        hasher = PasswordHasher("process", PASSWORD_HASH_WORKERS, 0)
+        try:
+            hashes = await asyncio.gather(
+                *(hasher.run(hash_password, u["password"], block=True) for u in users_data)
+            )
+        finally:
+            hasher.shutdown()
+
         users = []
-        for u in users_data:
-            password_hash = pwd_context.hash(u["password"])
+        for u, password_hash in zip(users_data, hashes):
             users.append(User(
                 first_name=u["first_name"],
                 last_name=u["last_name"],
@@ -52,5 +70,127 @@ async def seed():
         await session.commit()
         print("Seed completed successfully!")
 
+
+def generate_rows(rng: random.Random, start: int, count: int, args) -> list[dict]:
+    now = datetime.now().astimezone()
+    rows = []
+    for index in range(start, start + count):
+        first_name, first_latin = rng.choice(FIRST_NAMES)
+        last_name, last_latin = rng.choice(LAST_NAMES)
+        created_at = now - timedelta(seconds=rng.randrange(args.days * 86400))
+        rows.append({
+            "first_name": first_name,
+            "last_name": last_name,
+            "middle_name": rng.choice(MIDDLE_NAMES),
+            "email": f"{first_latin}.{last_latin}.{index}@example.com",
+            "password": "".join(rng.choices(string.digits, k=4)),
+            "role": "admin" if rng.random() < args.admin_ratio else "user",
+            "is_active": rng.random() >= args.deleted_ratio,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return rows
+
+
+async def hash_rows(hasher: PasswordHasher, rows: list[dict], fast_hashes: dict[str, str] | None) -> list[dict]:
+    if fast_hashes is not None:
+        hashes = [fast_hashes[row["password"]] for row in rows]
+    else:
+        hashes = await asyncio.gather(
+            *(hasher.run(hash_password, row["password"], block=True) for row in rows)
+        )
+    for row, password_hash in zip(rows, hashes):
+        row["password_hash"] = password_hash
+        del row["password"]
+    return rows
+
+
+async def generate(args):
+    """
+    Генерирует args.users синтетических пользователей.
+
+    Пароли хэшируются параллельно в пуле процессов, строки вставляются
+    многострочными INSERT пачками по args.chunk_size. Хэширование следующей
+    пачки идёт одновременно со вставкой текущей. В режиме --fast пароли
+    берутся из небольшого пула заранее посчитанных хэшей.
+    """
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with async_session_maker() as session:
+        start = (await session.scalar(select(func.max(User.id)))) or 0
+        if start and not args.append:
+            print("Users already exist — use --append to add more.")
+            return
+
+    rng = random.Random(args.seed)
+    hasher = PasswordHasher("process", args.workers, 0)
+    fast_hashes = None
+    if args.fast:
+        # В режиме fast пароли выбираются только из пула, для которого посчитаны хэши
+        pool = ["".join(rng.choices(string.digits, k=4)) for _ in range(args.fast_pool)]
+        hashes = await asyncio.gather(*(hasher.run(hash_password, p, block=True) for p in pool))
+        fast_hashes = dict(zip(pool, hashes))
+        pool = list(fast_hashes)
+
+    def next_rows(offset: int) -> list[dict]:
+        rows = generate_rows(rng, start + offset, min(args.chunk_size, args.users - offset), args)
+        if fast_hashes is not None:
+            for row in rows:
+                row["password"] = rng.choice(pool)
+        return rows
+
+    started_at = time.perf_counter()
+    done = 0
+    try:
+        pending = asyncio.create_task(hash_rows(hasher, next_rows(0), fast_hashes))
+        while pending is not None:
+            rows = await pending
+            offset = done + len(rows)
+            pending = None
+            if offset < args.users:
+                pending = asyncio.create_task(hash_rows(hasher, next_rows(offset), fast_hashes))
+
+            async with async_session_maker() as session:
+                await session.execute(insert(User), rows)
+                await session.commit()
+
+            done = offset
+            elapsed = time.perf_counter() - started_at
+            print(f"{done}/{args.users} users ({done / elapsed:.0f}/s)", flush=True)
+    finally:
+        hasher.shutdown()
+
+    print(f"Generated {done} users in {time.perf_counter() - started_at:.1f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.seed",
+        description="Без аргументов добавляет тестовых пользователей, с --users генерирует синтетические данные"
+    )
+    parser.add_argument("--users", type=int, help="Сколько пользователей сгенерировать")
+    parser.add_argument("--admin-ratio", type=float, default=0.01, help="Доля администраторов")
+    parser.add_argument("--deleted-ratio", type=float, default=0.1, help="Доля удалённых (неактивных)")
+    parser.add_argument("--days", type=int, default=3 * 365, help="Разброс created_at в днях назад")
+    parser.add_argument("--seed", type=int, default=0, help="Seed генератора случайных чисел")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Строк в одном INSERT")
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS, help="Процессов для хэширования")
+    parser.add_argument("--fast", action="store_true", help="Брать хэши из пула заранее посчитанных")
+    parser.add_argument("--fast-pool", type=int, default=16, help="Размер пула хэшей для --fast")
+    parser.add_argument("--append", action="store_true", help="Добавить к уже существующим пользователям")
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    try:
+        if args.users:
+            await generate(args)
+        else:
+            await seed()
+    finally:
+        await async_engine.dispose()
+
+
 if __name__ == "__main__":
-    asyncio.run(seed())
+    asyncio.run(main(parse_args()))
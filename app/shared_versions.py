@@ -0,0 +1,131 @@
+import fcntl
+import os
+import struct
+import sys
+import tempfile
+from multiprocessing import resource_tracker, shared_memory
+
+from app.config import SHARED_VERSIONS_NAME, SHARED_VERSIONS_SLOTS
+
+# Минимальная версия для деактивированного пользователя: не пройдёт ни один токен
+DEACTIVATED = 2 ** 63 - 1
+
+_MAGIC = b"UVTAB001"
+_HEADER = struct.Struct("<8sQ")
+# seq (чётный — запись завершена), user_id, минимальная допустимая token_version
+_SLOT = struct.Struct("<Qqq")
+
+
+class SharedVersionTable:
+    """
+    Таблица user_id -> минимальная допустимая token_version в разделяемой
+    памяти, общая для всех воркеров на узле.
+
+    Воркер, который деактивировал пользователя или отозвал его токены,
+    записывает новую версию; остальные видят её при следующей проверке
+    токена, без запроса в БД и без ожидания TTL кэша.
+
+    Таблица с прямой адресацией (слот = user_id % slots): запись другого
+    пользователя в тот же слот вытесняет старую, и тогда проверка просто
+    переходит к обычному пути через кэш и БД. Поэтому таблица может только
+    отклонить токен раньше, но никогда не пропускает отозванный.
+
+    Чтение без блокировок по seqlock: писатель делает seq нечётным, пишет
+    слот и снова делает seq чётным; читатель повторяет чтение, если seq
+    изменился. Писатели (редкие) сериализуются через flock.
+    """
+
+    def __init__(self, name: str, slots: int):
+        self.name = name
+        self.slots = slots
+        self._shm: shared_memory.SharedMemory | None = None
+        self._buf = None
+        self._lock_fd: int | None = None
+        self.writes = 0
+        self.rejections = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._buf is not None
+
+    def open(self):
+        if self.slots <= 0 or self.enabled:
+            return
+        size = _HEADER.size + self.slots * _SLOT.size
+        self._lock_fd = os.open(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            try:
+                shm = self._attach(create=True, size=size)
+                _HEADER.pack_into(shm.buf, 0, _MAGIC, self.slots)
+            except FileExistsError:
+                shm = self._attach(create=False)
+                magic, slots = _HEADER.unpack_from(shm.buf, 0)
+                if magic != _MAGIC or slots != self.slots:
+                    shm.close()
+                    raise RuntimeError(f"Shared memory {self.name} has another layout, remove /dev/shm/{self.name}")
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        self._shm = shm
+        self._buf = shm.buf
+
+    def _attach(self, create: bool, size: int = 0) -> shared_memory.SharedMemory:
+        # Сегмент должен пережить любой отдельный воркер, поэтому resource
+        # tracker не должен удалять его при выходе процесса
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(self.name, create=create, size=size, track=False)
+        shm = shared_memory.SharedMemory(self.name, create=create, size=size)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+    def _offset(self, user_id: int) -> int:
+        return _HEADER.size + (user_id % self.slots) * _SLOT.size
+
+    def publish(self, user_id: int, min_version: int):
+        """Токены пользователя с версией меньше min_version больше не действительны."""
+        if not self.enabled:
+            return
+        offset = self._offset(user_id)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            seq, stored_id, stored_version = _SLOT.unpack_from(self._buf, offset)
+            if stored_id == user_id:
+                min_version = max(min_version, stored_version)
+            _SLOT.pack_into(self._buf, offset, seq + 1, stored_id, stored_version)
+            _SLOT.pack_into(self._buf, offset, seq + 1, user_id, min_version)
+            _SLOT.pack_into(self._buf, offset, seq + 2, user_id, min_version)
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        self.writes += 1
+
+    def min_version(self, user_id: int) -> int | None:
+        if not self.enabled:
+            return None
+        offset = self._offset(user_id)
+        for _ in range(3):
+            seq, stored_id, version = _SLOT.unpack_from(self._buf, offset)
+            if seq % 2 == 0 and _SLOT.unpack_from(self._buf, offset)[0] == seq:
+                return version if stored_id == user_id and seq else None
+        return None
+
+    def rejects(self, user_id: int, token_version: int) -> bool:
+        min_version = self.min_version(user_id)
+        if min_version is not None and token_version < min_version:
+            self.rejections += 1
+            return True
+        return False
+
+    def close(self):
+        if self._shm is not None:
+            self._buf = None
+            self._shm.close()
+            self._shm = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> dict:
+        return {"enabled": int(self.enabled), "slots": self.slots, "writes": self.writes, "rejections": self.rejections}
+
+
+shared_versions = SharedVersionTable(SHARED_VERSIONS_NAME, SHARED_VERSIONS_SLOTS)
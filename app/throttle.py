@@ -0,0 +1,201 @@
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+from app.config import (
+    LOGIN_EMAIL_RATE_PER_MINUTE,
+    LOGIN_EMAIL_BURST,
+    LOGIN_EMAIL_LOCKOUT_THRESHOLD,
+    LOGIN_IP_RATE_PER_MINUTE,
+    LOGIN_IP_BURST,
+    LOGIN_IP_LOCKOUT_THRESHOLD,
+    LOGIN_LOCKOUT_BASE_SECONDS,
+    LOGIN_LOCKOUT_MAX_SECONDS,
+    LOGIN_THROTTLE_MAX_ENTRIES,
+    LOGIN_TRUSTED_PROXIES
+)
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "failures", "locked_until")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.failures = 0
+        self.locked_until = 0.0
+
+
+class LoginThrottle:
+    """
+    Token bucket на ключ (email или IP) и экспоненциальная блокировка.
+
+    Каждый ключ получает `burst` попыток, которые восстанавливаются со
+    скоростью `rate_per_minute`. После `lockout_threshold` неудач подряд ключ
+    блокируется на lockout_base * 2^n секунд (не больше lockout_max).
+    Число ключей ограничено `max_entries`: вытесняются давно не
+    использованные, а полностью восстановившиеся удаляются при периодической
+    очистке. Заблокированные ключи хранятся отдельно и не вытесняются —
+    иначе перебор множества email снимал бы блокировку; в общий LRU они
+    возвращаются, когда блокировка истекла.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, lockout_threshold: int,
+                 lockout_base: float, lockout_max: float, max_entries: int):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.lockout_threshold = lockout_threshold
+        self.lockout_base = lockout_base
+        self.lockout_max = lockout_max
+        self.max_entries = max_entries
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+        self._locked: dict[str, _Bucket] = {}
+        self._next_sweep = 0.0
+        self.rejected = 0
+        self.evictions = 0
+
+    def _insert(self, key: str, bucket: _Bucket):
+        self._buckets[key] = bucket
+        if len(self._buckets) > self.max_entries:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+    def _get(self, key: str, now: float) -> _Bucket:
+        bucket = self._locked.get(key)
+        if bucket is None:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(self.burst, now)
+                self._insert(key, bucket)
+                return bucket
+            self._buckets.move_to_end(key)
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        return bucket
+
+    def retry_after(self, key: str, now: float) -> float:
+        """Сколько секунд ждать до следующей попытки, 0 — можно сейчас."""
+        bucket = self._get(key, now)
+        if bucket.locked_until > now:
+            return bucket.locked_until - now
+        if bucket.tokens < 1:
+            return (1 - bucket.tokens) / self.rate
+        return 0.0
+
+    def consume(self, key: str, now: float):
+        self._get(key, now).tokens -= 1
+
+    def failure(self, key: str, now: float):
+        bucket = self._get(key, now)
+        bucket.failures += 1
+        over = bucket.failures - self.lockout_threshold
+        if over >= 0:
+            bucket.locked_until = now + min(self.lockout_max, self.lockout_base * 2 ** over)
+            if key not in self._locked:
+                self._locked[key] = self._buckets.pop(key)
+
+    def success(self, key: str, now: float):
+        bucket = self._locked.pop(key, None)
+        if bucket is not None:
+            self._insert(key, bucket)
+        else:
+            bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.failures = 0
+            bucket.locked_until = 0.0
+
+    def sweep(self, now: float):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + 60
+        # Счётчик неудач сохраняется: следующая неудача снова заблокирует ключ, на вдвое дольше
+        for key in [key for key, bucket in self._locked.items() if bucket.locked_until <= now]:
+            self._insert(key, self._locked.pop(key))
+        full_after = self.burst / self.rate if self.rate else math.inf
+        for key in [
+            key for key, bucket in self._buckets.items()
+            if bucket.locked_until <= now and now - bucket.updated >= max(full_after, self.lockout_max)
+        ]:
+            del self._buckets[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._buckets) + len(self._locked),
+            "locked": len(self._locked),
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
+
+
+email_throttle = LoginThrottle(
+    LOGIN_EMAIL_RATE_PER_MINUTE, LOGIN_EMAIL_BURST, LOGIN_EMAIL_LOCKOUT_THRESHOLD,
+    LOGIN_LOCKOUT_BASE_SECONDS, LOGIN_LOCKOUT_MAX_SECONDS, LOGIN_THROTTLE_MAX_ENTRIES
+)
+ip_throttle = LoginThrottle(
+    LOGIN_IP_RATE_PER_MINUTE, LOGIN_IP_BURST, LOGIN_IP_LOCKOUT_THRESHOLD,
+    LOGIN_LOCKOUT_BASE_SECONDS, LOGIN_LOCKOUT_MAX_SECONDS, LOGIN_THROTTLE_MAX_ENTRIES
+)
+
+
+_trusted_proxies = [ipaddress.ip_network(item, strict=False) for item in LOGIN_TRUSTED_PROXIES]
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies)
+
+
+def client_ip(request: Request) -> str | None:
+    """
+    IP клиента для ограничения попыток. За доверенным прокси (LOGIN_TRUSTED_PROXIES)
+    берётся самый правый адрес X-Forwarded-For, не принадлежащий прокси:
+    левые значения клиент может подставить сам.
+    """
+    ip = request.client.host if request.client else None
+    if ip is None or not _is_trusted(ip):
+        return ip
+    forwarded = [item.strip() for item in request.headers.get("x-forwarded-for", "").split(",") if item.strip()]
+    for address in reversed(forwarded):
+        if not _is_trusted(address):
+            return address
+    return forwarded[0] if forwarded else ip
+
+
+def check_login_allowed(email: str, ip: str | None):
+    """Отклоняет попытку входа с 429 до обращения к БД и bcrypt."""
+    now = time.monotonic()
+    email = email.lower()
+    checks = [(email_throttle, email)]
+    if ip:
+        checks.append((ip_throttle, ip))
+
+    for throttle, key in checks:
+        throttle.sweep(now)
+        wait = throttle.retry_after(key, now)
+        if wait > 0:
+            throttle.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много попыток входа, попробуйте позже",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+    for throttle, key in checks:
+        throttle.consume(key, now)
+
+
+def record_login_result(email: str, ip: str | None, success: bool):
+    now = time.monotonic()
+    email = email.lower()
+    for throttle, key in ((email_throttle, email), (ip_throttle, ip)):
+        if not key:
+            continue
+        if success:
+            throttle.success(key, now)
+        else:
+            throttle.failure(key, now)
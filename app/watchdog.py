@@ -0,0 +1,206 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from app.config import (
+    WATCHDOG_THRESHOLD_MS,
+    WATCHDOG_INTERVAL_MS,
+    WATCHDOG_TOP_N
+)
+from app.metrics import Histogram
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STACK_DEPTH = 40
+MAX_ENTRIES = 1000
+
+
+class _Block:
+    __slots__ = ("route", "stack", "count", "seconds", "max_seconds", "last_seen")
+
+    def __init__(self, route: str, stack: traceback.StackSummary | None):
+        self.route = route
+        self.stack = stack
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seen = 0.0
+
+    def report(self) -> dict:
+        return {
+            "route": self.route,
+            "count": self.count,
+            "total_ms": self.seconds * 1000,
+            "max_ms": self.max_seconds * 1000,
+            "last_seen": self.last_seen,
+            # От внутреннего кадра к внешнему: первая строка — код, который держал event loop
+            "stack": [
+                f"{frame.filename}:{frame.lineno} in {frame.name}" + (f": {frame.line}" if frame.line else "")
+                for frame in self.stack or ()
+            ],
+        }
+
+
+class LoopWatchdog:
+    """
+    Обнаружение блокировок event loop синхронным кодом.
+
+    Корутина-пульс в event loop каждые `interval` секунд отмечает время и
+    измеряет, насколько позже запланированного проснулась (задержка loop).
+    Отдельный поток следит за пульсом: если тот не обновлялся дольше
+    `interval + threshold`, loop занят одним обратным вызовом, и поток
+    снимает стек потока loop через sys._current_frames(). Маршрут берётся
+    по текущей задаче loop из таблицы, которую заполняет WatchdogMiddleware.
+
+    Когда loop освобождается, пульс записывает блокировку с её длительностью
+    в агрегат по (маршрут, стек). Число разных записей ограничено
+    MAX_ENTRIES, лишние считаются в `dropped`.
+    """
+
+    def __init__(self, threshold: float, interval: float, top_n: int):
+        self.threshold = threshold
+        self.interval = interval
+        self.top_n = top_n
+        self.requests: dict[asyncio.Task, dict] = {}
+        self.lag = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.blocked_seconds = 0.0
+        self.dropped = 0
+        self._entries: dict[tuple, _Block] = {}
+        self._beat = 0.0
+        self._captured: tuple[float, str, traceback.StackSummary] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._sample, name="loop-watchdog-sampler", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            beat = self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - beat - self.interval)
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._record_block(beat, lag)
+
+    def _record_block(self, beat: float, lag: float):
+        captured = self._captured
+        if captured is not None and captured[0] == beat:
+            _, route, stack = captured
+        else:
+            # Поток не успел снять стек (блокировка чуть дольше порога)
+            route, stack = "unknown", None
+        self.blocks += 1
+        self.blocked_seconds += lag
+
+        key = (route, tuple((frame.filename, frame.lineno, frame.name) for frame in stack or ()))
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= MAX_ENTRIES:
+                self.dropped += 1
+                return
+            entry = self._entries[key] = _Block(route, stack)
+        entry.count += 1
+        entry.seconds += lag
+        entry.max_seconds = max(entry.max_seconds, lag)
+        entry.last_seen = time.time()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            if time.monotonic() - beat <= self.interval + self.threshold:
+                continue
+            if self._captured is not None and self._captured[0] == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.StackSummary.extract(traceback.walk_stack(frame), limit=STACK_DEPTH, lookup_lines=False)
+            self._captured = (beat, self._route(), stack)
+
+    def _route(self) -> str:
+        task = asyncio.current_task(self._loop)
+        scope = self.requests.get(task) if task is not None else None
+        if scope is None:
+            return "background" if task is not None else "callback"
+        route = scope.get("route")
+        return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+    def report(self, limit: int | None = None) -> dict:
+        top = sorted(self._entries.values(), key=lambda entry: entry.seconds, reverse=True)
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "blocks": self.blocks,
+            "blocked_ms_total": self.blocked_seconds * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+            "lag_ms": {bound: count for bound, count in self.lag.cumulative()},
+            "dropped": self.dropped,
+            "top": [entry.report() for entry in top[:limit or self.top_n]],
+        }
+
+    def reset(self):
+        self._entries.clear()
+        self.lag = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.blocks = 0
+        self.blocked_seconds = 0.0
+        self.dropped = 0
+
+    def stats(self) -> dict:
+        return {
+            "lag_samples": self.lag.count,
+            "lag_seconds_total": self.lag.sum,
+            "max_lag_seconds": self.max_lag,
+            "blocks": self.blocks,
+            "blocked_seconds_total": self.blocked_seconds,
+        }
+
+
+class WatchdogMiddleware:
+    """Связывает задачу, обрабатывающую запрос, с его ASGI scope для отчёта watchdog."""
+
+    def __init__(self, app, watchdog: LoopWatchdog):
+        self.app = app
+        self.watchdog = watchdog
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        self.watchdog.requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.watchdog.requests.pop(task, None)
+
+
+loop_watchdog = LoopWatchdog(WATCHDOG_THRESHOLD_MS / 1000, WATCHDOG_INTERVAL_MS / 1000, WATCHDOG_TOP_N)
@@ -0,0 +1,134 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Бенчмарки не должны требовать PostgreSQL и .env: задаём значения до импорта app
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-" + "0" * 43)
+os.environ.setdefault("PASSWORD_HASH_EXECUTOR", "thread")
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(suite: str, name: str, samples: list[float], params: dict | None = None,
+              alloc: tuple[int, int] | None = None) -> dict:
+    total = sum(samples)
+    result = {
+        "suite": suite,
+        "name": name,
+        "params": params or {},
+        "iterations": len(samples),
+        "ops_per_sec": len(samples) / total if total else float("inf"),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+    if alloc is not None:
+        result["alloc_peak_bytes"], result["alloc_net_bytes_per_op"] = alloc
+    return result
+
+
+def measure(fn, iterations: int, warmup: int = 3) -> tuple[list[float], tuple[int, int]]:
+    """Время каждого вызова fn() и память: пиковый прирост за вызов и остаток на вызов."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples, _allocations(fn, min(iterations, 50))
+
+
+async def measure_async(fn, iterations: int, warmup: int = 3) -> tuple[list[float], tuple[int, int]]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+
+    runs = min(iterations, 50)
+    tracemalloc.start()
+    try:
+        peak = 0
+        base, _ = tracemalloc.get_traced_memory()
+        for _ in range(runs):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        net = (tracemalloc.get_traced_memory()[0] - base) // runs
+    finally:
+        tracemalloc.stop()
+    return samples, (peak, net)
+
+
+def _allocations(fn, runs: int) -> tuple[int, int]:
+    tracemalloc.start()
+    try:
+        peak = 0
+        base, _ = tracemalloc.get_traced_memory()
+        for _ in range(runs):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        net = (tracemalloc.get_traced_memory()[0] - base) // runs
+    finally:
+        tracemalloc.stop()
+    return peak, net
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_report(path: str | None, results: list[dict], extra: dict | None = None):
+    report = {"meta": metadata(), **(extra or {}), "results": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+def compare_reports(old_path: str, results: list[dict]):
+    """Печатает изменение ops/s и p99 относительно сохранённого отчёта."""
+    with open(old_path, encoding="utf-8") as file:
+        old = {
+            (r["suite"], r["name"], json.dumps(r["params"], sort_keys=True)): r
+            for r in json.load(file)["results"]
+        }
+    for result in results:
+        key = (result["suite"], result["name"], json.dumps(result["params"], sort_keys=True))
+        before = old.get(key)
+        if before is None:
+            continue
+        ops = (result["ops_per_sec"] / before["ops_per_sec"] - 1) * 100
+        p99 = (result["p99_ms"] / before["p99_ms"] - 1) * 100 if before["p99_ms"] else 0.0
+        print(f"{result['suite']:>14} {result['name']:<40} ops/s {ops:+7.1f}%  p99 {p99:+7.1f}%", file=sys.stderr)
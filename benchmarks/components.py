@@ -0,0 +1,247 @@
+"""
+Микробенчмарки горячих путей аутентификации.
+
+    python -m benchmarks.components --output bench.json
+    python -m benchmarks.components --suite jwt crud --compare bench.json
+
+CRUD измеряется на временной SQLite (aiosqlite) вместо PostgreSQL. Чтобы
+стоимость запросов не терялась на фоне bcrypt, в наборе crud пароли
+хэшируются с минимальной стоимостью; bcrypt отдельно измеряется в наборе
+hashing. Наборы serialization и listing дополнительно сообщают rows_per_sec.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.common import (
+    measure,
+    measure_async,
+    summarize,
+    write_report,
+    compare_reports
+)
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+import app.hashing
+from app.auth import create_access_token, decode_token
+from app.keys import key_ring
+from app.database import crud
+from app.database.database import Base
+from app.database.users import User
+from app.schemas.users import User as UserResponse, UserPage
+from app.api.responses import FastJSONResponse
+
+SUITES = ("hashing", "jwt", "crud", "serialization", "listing")
+
+
+def bench_hashing(scale: float) -> list[dict]:
+    results = []
+    for rounds in (4, 8, 10, 12):
+        context = app.hashing.build_context(app.hashing.HashPolicy("bcrypt", rounds))
+        iterations = max(3, int(200 * scale / 2 ** (rounds - 4)))
+        hashed = context.hash("benchmark")
+
+        samples, alloc = measure(lambda: context.hash("benchmark"), iterations, warmup=1)
+        results.append(summarize("hashing", "hash_password", samples, {"rounds": rounds}, alloc))
+
+        samples, alloc = measure(lambda: context.verify("benchmark", hashed), iterations, warmup=1)
+        results.append(summarize("hashing", "verify_password", samples, {"rounds": rounds}, alloc))
+    return results
+
+
+def bench_jwt(scale: float) -> list[dict]:
+    iterations = int(5000 * scale)
+    claims = {"sub": "bench@example.com", "role": "user", "id": 1, "ver": 0}
+    token = create_access_token(claims)
+
+    results = []
+    samples, alloc = measure(lambda: create_access_token(claims), iterations)
+    results.append(summarize("jwt", "create_access_token", samples, alloc=alloc))
+
+    samples, alloc = measure(lambda: key_ring.decode(token), iterations)
+    results.append(summarize("jwt", "key_ring.decode", samples, {"algorithm": key_ring.algorithm}, alloc))
+
+    samples, alloc = measure(lambda: decode_token(token), iterations)
+    results.append(summarize("jwt", "decode_token (cached)", samples, alloc=alloc))
+    return results
+
+
+async def _seed(session_maker, rows: int, password_hash: str):
+    async with session_maker() as db:
+        await db.execute(insert(User), [
+            {
+                "first_name": "Имя",
+                "last_name": "Фамилия",
+                "middle_name": "Отчество",
+                "email": f"user{i}@example.com",
+                "password_hash": password_hash,
+                "is_active": i % 10 != 0,
+                "role": "admin" if i % 100 == 0 else "user",
+                "created_at": datetime(2025, 1, 1).astimezone(),
+            }
+            for i in range(1, rows + 1)
+        ])
+        await db.commit()
+
+
+async def bench_crud(scale: float) -> list[dict]:
+    app.hashing.configure(app.hashing.HashPolicy("bcrypt", 4))
+    iterations = int(500 * scale)
+    rows = 10_000
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.sqlite')}")
+        session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await _seed(session_maker, rows, app.hashing.hash_password("benchmark"))
+
+        counter = itertools.count(rows + 1)
+        ids = itertools.cycle(range(2, rows + 1))
+
+        def with_session(fn):
+            async def run():
+                async with session_maker() as db:
+                    return await fn(db)
+            return run
+
+        cases = {
+            "get_user_by_email": lambda db: crud.get_user_by_email(db, "user5000@example.com"),
+            "get_user_by_id": lambda db: crud.get_user_by_id(db, 5000),
+            "get_password_hash": lambda db: crud.get_password_hash(db, User(id=5000)),
+            "get_active_users (limit=50)": lambda db: crud.get_active_users(db, 50),
+            "get_deleted_users (limit=50)": lambda db: crud.get_deleted_users(db, 50),
+            "authenticate_user": lambda db: crud.authenticate_user(db, "user5001@example.com", "benchmark"),
+            "create_user": lambda db: crud.create_user(db, {
+                "first_name": "Имя", "last_name": "Фамилия", "middle_name": "Отчество",
+                "email": f"new{next(counter)}@example.com", "password": "benchmark",
+                "verf_password": "benchmark", "role": "user"
+            }),
+            "update_user": lambda db: crud.update_user(
+                db, User(id=next(ids), email="-"), {"first_name": "Новое"}
+            ),
+            "update_user_by_id": lambda db: crud.update_user_by_id(db, next(ids), {"last_name": "Новая"}),
+            "deactivate_user": lambda db: crud.deactivate_user(db, next(ids)),
+            "deactivate_user_by_id": lambda db: crud.deactivate_user_by_id(db, next(ids)),
+            "deactivate_users_bulk (100 ids)": lambda db: crud.deactivate_users_bulk(
+                db, [next(ids) for _ in range(100)]
+            ),
+            "update_users_bulk (100 items)": lambda db: crud.update_users_bulk(
+                db, [{"id": next(ids), "middle_name": "Пакет"} for _ in range(100)]
+            ),
+        }
+
+        results = []
+        try:
+            for name, fn in cases.items():
+                samples, alloc = await measure_async(with_session(fn), iterations)
+                results.append(summarize("crud", name, samples, {"rows": rows}, alloc))
+        finally:
+            await engine.dispose()
+            app.hashing.password_hasher.shutdown()
+    return results
+
+
+def bench_serialization(scale: float) -> list[dict]:
+    adapter = TypeAdapter(list[UserResponse])
+    created_at = datetime(2025, 1, 1).astimezone()
+    results = []
+    for size in (10, 100, 1000, 10000):
+        users = [
+            User(
+                id=i, first_name="Имя", last_name="Фамилия", middle_name="Отчество",
+                email=f"user{i}@example.com", password_hash="-", role="user",
+                is_active=True, created_at=created_at, updated_at=created_at
+            )
+            for i in range(size)
+        ]
+        rows = [{column.key: getattr(user, column.key) for column in crud.USER_LIST_COLUMNS} for user in users]
+        iterations = max(5, int(20000 * scale / size))
+        samples, alloc = measure(lambda: adapter.dump_json(adapter.validate_python(users)), iterations)
+        results.append(_with_rows(summarize("serialization", "list[User] validate+dump_json", samples, {"size": size}, alloc), size))
+        samples, alloc = measure(lambda: FastJSONResponse(rows).body, iterations)
+        results.append(_with_rows(summarize("serialization", "rows FastJSONResponse", samples, {"size": size}, alloc), size))
+    return results
+
+
+def _with_rows(result: dict, rows: int) -> dict:
+    result["rows_per_sec"] = result["ops_per_sec"] * rows
+    return result
+
+
+async def bench_listing(scale: float) -> list[dict]:
+    """
+    Список из 10k пользователей от запроса в БД до JSON: ORM-объекты с
+    валидацией через schemas.users.User против колонок и FastJSONResponse.
+    """
+    rows = 10_000
+    iterations = max(3, int(30 * scale))
+    adapter = TypeAdapter(UserPage)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.sqlite')}")
+        session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await _seed(session_maker, rows, "-")
+
+        async def orm_path():
+            async with session_maker() as db:
+                result = await db.scalars(
+                    select(User).where(User.is_active == True).order_by(User.created_at, User.id).limit(rows)
+                )
+                return adapter.dump_json(adapter.validate_python({"items": result.all(), "next_cursor": None}))
+
+        async def fast_path():
+            async with session_maker() as db:
+                users, next_cursor = await crud.get_active_users(db, rows)
+                return FastJSONResponse({"items": users, "next_cursor": next_cursor}).body
+
+        results = []
+        try:
+            for name, fn in (("ORM + validate + dump_json", orm_path), ("columns + FastJSONResponse", fast_path)):
+                samples, alloc = await measure_async(fn, iterations, warmup=1)
+                returned = rows - rows // 10
+                results.append(_with_rows(summarize("listing", name, samples, {"rows": returned}, alloc), returned))
+        finally:
+            await engine.dispose()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.components")
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--output", help="Куда сохранить JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--quick", action="store_true", help="В 10 раз меньше итераций")
+    args = parser.parse_args(argv)
+
+    scale = 0.1 if args.quick else 1.0
+    results = []
+    for suite in args.suite:
+        print(f"running {suite}...", file=sys.stderr)
+        if suite == "hashing":
+            results += bench_hashing(scale)
+        elif suite == "jwt":
+            results += bench_jwt(scale)
+        elif suite == "crud":
+            results += asyncio.run(bench_crud(scale))
+        elif suite == "serialization":
+            results += bench_serialization(scale)
+        elif suite == "listing":
+            results += asyncio.run(bench_listing(scale))
+
+    write_report(args.output, results)
+    if args.compare:
+        compare_reports(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
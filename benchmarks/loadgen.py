@@ -0,0 +1,393 @@
+"""
+Нагрузочный прогон сквозных сценариев аутентификации.
+
+    python -m benchmarks.loadgen --duration 30 --concurrency 50
+    python -m benchmarks.loadgen --rate 200 --scenario signup=1 login=3 profile=4 admin=2
+    python -m benchmarks.loadgen --url http://localhost:8000 --output load.json
+    python -m benchmarks.loadgen --compare load.json
+
+Без --url приложение запускается в этом же процессе (httpx.ASGITransport,
+с lifespan) на временной SQLite-базе; ограничение попыток входа в этом
+режиме ослаблено, так как все запросы приходят с одного адреса. Против
+запущенного сервиса по --url ограничение нужно ослабить в его окружении,
+иначе ответы 429 попадут в ошибки. Стоимость bcrypt задаётся как обычно,
+например PASSWORD_HASH_ROUNDS=4, чтобы измерять всё, кроме хэширования.
+
+Сценарии:
+    signup  — регистрация, вход, refresh, PUT /users/me, удаление аккаунта
+    login   — вход заранее созданного пользователя и refresh
+    profile — GET /users/me, повторный GET с If-None-Match, PUT /users/me
+    admin   — две страницы GET /admins/, повторный GET с If-None-Match, поиск
+
+По умолчанию нагрузка замкнутая: --concurrency виртуальных пользователей
+выполняют сценарии друг за другом. С --rate сценарии запускаются с
+пуассоновским потоком прибытия (сценариев в секунду) независимо от
+ответов сервиса, но одновременно выполняется не больше --concurrency;
+задержка старта относительно расписания попадает в отчёт.
+
+Отчёт — JSON в формате benchmarks.components (для --compare): по каждому
+эндпоинту и сценарию пропускная способность, p50/p95/p99, доля ошибок и
+коды ответов, плюс задержка event loop процесса генератора (в режиме
+in-process это и event loop приложения).
+"""
+import os
+import tempfile
+
+# В режиме in-process база — временный файл: SQLite в памяти у aiosqlite
+# работает через одно соединение и не показывает поведение пула
+LOADGEN_DB = os.path.join(tempfile.gettempdir(), f"loadgen-{os.getpid()}.sqlite")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{LOADGEN_DB}")
+for name in ("LOGIN_EMAIL_RATE_PER_MINUTE", "LOGIN_EMAIL_BURST", "LOGIN_IP_RATE_PER_MINUTE", "LOGIN_IP_BURST"):
+    os.environ.setdefault(name, "1000000")
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+
+import httpx
+
+from benchmarks.common import percentile, summarize, write_report, compare_reports
+
+SCENARIOS = ("signup", "login", "profile", "admin")
+DEFAULT_WEIGHTS = {"signup": 1, "login": 3, "profile": 4, "admin": 2}
+PASSWORD = "loadgen"
+
+
+class Stats:
+    """Задержки и коды ответов по меткам (эндпоинт или сценарий)."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+
+    def record(self, label: str, seconds: float, status: int | str, ok: bool):
+        self.samples[label].append(seconds)
+        self.statuses[label][str(status)] += 1
+        if not ok:
+            self.errors[label] += 1
+
+    def results(self, suite: str, elapsed: float, params: dict) -> list[dict]:
+        results = []
+        for label, samples in sorted(self.samples.items()):
+            result = summarize(suite, label, samples, params)
+            # Для нагрузки ops_per_sec — пропускная способность за прогон, а не 1/задержка
+            result["ops_per_sec"] = len(samples) / elapsed
+            result["p95_ms"] = percentile(samples, 0.95) * 1000
+            result["max_ms"] = max(samples) * 1000
+            result["errors"] = self.errors[label]
+            result["error_rate"] = self.errors[label] / len(samples)
+            result["statuses"] = dict(self.statuses[label])
+            results.append(result)
+        return results
+
+
+class ScenarioFailed(Exception):
+    """Шаг сценария вернул неожиданный ответ, остальные шаги пропускаются."""
+
+
+class LoadRunner:
+    def __init__(self, client: httpx.AsyncClient, weights: dict[str, int], pool_size: int, seed: int | None):
+        self.client = client
+        self.weights = weights
+        self.pool_size = pool_size
+        self.rng = random.Random(seed)
+        self.stats = Stats()
+        self.scenario_stats = Stats()
+        self.pool: list[dict] = []
+        self.admin: dict | None = None
+        self.recording = False
+
+    async def request(self, label: str, method: str, url: str, expected=(200,), **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            if self.recording:
+                self.stats.record(label, time.perf_counter() - started, type(exc).__name__, False)
+            raise ScenarioFailed(f"{label}: {exc!r}") from exc
+        ok = response.status_code in expected
+        if self.recording:
+            self.stats.record(label, time.perf_counter() - started, response.status_code, ok)
+        if not ok:
+            raise ScenarioFailed(f"{label}: {response.status_code} {response.text[:200]}")
+        return response
+
+    def _email(self, prefix: str) -> str:
+        return f"{prefix}-{uuid.uuid4().hex[:12]}@example.com"
+
+    async def _register(self, email: str, role: str = "user"):
+        await self.request("POST /users/", "POST", "/users/", expected=(201,), json={
+            "first_name": "Нагрузка", "last_name": "Тестовый", "middle_name": "Сценарий",
+            "email": email, "password": PASSWORD, "verf_password": PASSWORD, "role": role
+        })
+
+    async def _login(self, email: str) -> dict:
+        response = await self.request("POST /users/token", "POST", "/users/token",
+                                      data={"username": email, "password": PASSWORD})
+        return response.json()
+
+    async def _refresh(self, tokens: dict) -> dict:
+        response = await self.request("POST /users/refresh-token", "POST", "/users/refresh-token",
+                                      params={"refresh_token": tokens["refresh_token"]})
+        return response.json()
+
+    async def _update_me(self, email: str, headers: dict):
+        await self.request("PUT /users/me", "PUT", "/users/me", headers=headers, json={
+            "first_name": f"Имя{self.rng.randrange(1000)}", "last_name": "Тестовый",
+            "middle_name": "Сценарий", "email": email
+        })
+
+    @staticmethod
+    def _auth(tokens: dict) -> dict:
+        return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    async def setup(self, concurrency: int):
+        """Администратор и пул пользователей для сценариев login и profile."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create(role: str) -> dict:
+            async with semaphore:
+                email = self._email("pool")
+                await self._register(email, role)
+                return {"email": email, "tokens": await self._login(email)}
+
+        self.admin = await create("admin")
+        self.pool = list(await asyncio.gather(*(create("user") for _ in range(self.pool_size))))
+
+    async def signup(self):
+        email = self._email("signup")
+        await self._register(email)
+        tokens = await self._refresh(await self._login(email))
+        headers = self._auth(tokens)
+        await self._update_me(email, headers)
+        await self.request("DELETE /users/", "DELETE", "/users/", headers=headers, json={"password": PASSWORD})
+
+    async def login(self):
+        user = self.rng.choice(self.pool)
+        await self._refresh(await self._login(user["email"]))
+
+    async def profile(self):
+        user = self.rng.choice(self.pool)
+        headers = self._auth(user["tokens"])
+        response = await self.request("GET /users/me", "GET", "/users/me", headers=headers)
+        # Профиль мог измениться параллельным сценарием: 200 тоже допустим
+        await self.request("GET /users/me (If-None-Match)", "GET", "/users/me", expected=(200, 304),
+                           headers={**headers, "If-None-Match": response.headers.get("etag", "")})
+        await self._update_me(user["email"], headers)
+
+    async def admin_listing(self):
+        headers = self._auth(self.admin["tokens"])
+        first = await self.request("GET /admins/", "GET", "/admins/", headers=headers, params={"limit": 50})
+        cursor = first.json()["next_cursor"]
+        if cursor:
+            await self.request("GET /admins/ (cursor)", "GET", "/admins/", headers=headers,
+                               params={"limit": 50, "cursor": cursor})
+        await self.request("GET /admins/ (If-None-Match)", "GET", "/admins/", expected=(200, 304),
+                           headers={**headers, "If-None-Match": first.headers.get("etag", "")},
+                           params={"limit": 50})
+        await self.request("GET /admins/search", "GET", "/admins/search", headers=headers,
+                           params={"q": "pool", "mode": "prefix", "limit": 20})
+
+    async def run_scenario(self, name: str):
+        scenario = self.admin_listing if name == "admin" else getattr(self, name)
+        started = time.perf_counter()
+        try:
+            await scenario()
+        except ScenarioFailed:
+            self.scenario_stats.record(f"scenario {name}", time.perf_counter() - started, "failed", False)
+        else:
+            self.scenario_stats.record(f"scenario {name}", time.perf_counter() - started, "ok", True)
+
+    def pick(self) -> str:
+        names = list(self.weights)
+        return self.rng.choices(names, weights=[self.weights[name] for name in names])[0]
+
+    async def closed_loop(self, concurrency: int, deadline: float):
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.run_scenario(self.pick())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float, concurrency: int, deadline: float) -> list[float]:
+        """Запуск сценариев по расписанию; возвращает задержки старта относительно него."""
+        semaphore = asyncio.Semaphore(concurrency)
+        delays: list[float] = []
+        tasks = set()
+
+        async def start(name: str, scheduled: float):
+            async with semaphore:
+                delays.append(time.perf_counter() - scheduled)
+                await self.run_scenario(name)
+
+        scheduled = time.perf_counter()
+        while True:
+            scheduled += self.rng.expovariate(rate)
+            if scheduled >= deadline:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            task = asyncio.create_task(start(self.pick(), scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return delays
+
+
+async def monitor_loop_lag(samples: list[float], stop: asyncio.Event, interval: float = 0.01):
+    """Насколько позже запланированного просыпается корутина: блокировки event loop."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+@asynccontextmanager
+async def client_for(url: str | None, concurrency: int, timeout: float):
+    if url:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+            yield client
+        return
+
+    import app.database.users  # noqa: F401  таблицы для create_all
+    import app.database.revoked_tokens  # noqa: F401
+    from app.main import app
+    from app.database.database import async_engine, Base
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=timeout) as client:
+                yield client
+    finally:
+        await async_engine.dispose()
+
+
+def _ms(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    return {
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+def print_table(results: list[dict], load: dict):
+    print(f"{'':<34} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}",
+          file=sys.stderr)
+    for result in results:
+        print(f"{result['name']:<34} {result['iterations']:>7} {result['ops_per_sec']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['error_rate'] * 100:>6.1f}%", file=sys.stderr)
+    lag = load["event_loop_lag"]
+    if lag:
+        print(f"event loop lag: p50 {lag['p50_ms']:.1f} ms, p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms",
+              file=sys.stderr)
+    if load.get("start_delay"):
+        delay = load["start_delay"]
+        print(f"start delay: p50 {delay['p50_ms']:.1f} ms, p99 {delay['p99_ms']:.1f} ms", file=sys.stderr)
+
+
+async def run(args) -> tuple[list[dict], dict]:
+    async with client_for(args.url, args.concurrency, args.timeout) as client:
+        runner = LoadRunner(client, args.weights, args.users, args.seed)
+        setup_started = time.perf_counter()
+        await runner.setup(args.concurrency)
+        setup_seconds = time.perf_counter() - setup_started
+
+        lag: list[float] = []
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(monitor_loop_lag(lag, stop))
+        runner.recording = True
+        started = time.perf_counter()
+        deadline = started + args.duration
+        delays = []
+        if args.rate:
+            delays = await runner.open_loop(args.rate, args.concurrency, deadline)
+        else:
+            await runner.closed_loop(args.concurrency, deadline)
+        elapsed = time.perf_counter() - started
+        runner.recording = False
+        stop.set()
+        await monitor
+
+    params = {
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "scenarios": ",".join(f"{name}={weight}" for name, weight in args.weights.items()),
+    }
+    results = runner.stats.results("loadgen", elapsed, params)
+    results += runner.scenario_stats.results("loadgen", elapsed, params)
+    load = {
+        "target": args.url or "in-process",
+        "duration_seconds": elapsed,
+        "setup_seconds": setup_seconds,
+        "requests": sum(len(samples) for samples in runner.stats.samples.values()),
+        "errors": sum(runner.stats.errors.values()),
+        "event_loop_lag": _ms(lag),
+        "start_delay": _ms(delays),
+    }
+    load["requests_per_sec"] = load["requests"] / elapsed
+    return results, load
+
+
+def parse_weights(values: list[str]) -> dict[str, int]:
+    weights = {}
+    for value in values:
+        name, _, weight = value.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Неизвестный сценарий {name}, доступны: {', '.join(SCENARIOS)}")
+        try:
+            weights[name] = int(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Вес сценария {name} должен быть целым числом")
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError("Хотя бы один сценарий должен иметь положительный вес")
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadgen")
+    parser.add_argument("--url", help="Адрес запущенного сервиса (по умолчанию приложение в этом процессе)")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность прогона, секунд")
+    parser.add_argument("--concurrency", type=int, default=20, help="Одновременно выполняемых сценариев")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Сценариев в секунду (открытая нагрузка); 0 — замкнутая нагрузка")
+    parser.add_argument("--scenario", nargs="+", default=[f"{name}={weight}" for name, weight in DEFAULT_WEIGHTS.items()],
+                        metavar="NAME=WEIGHT", help=f"Веса сценариев: {', '.join(SCENARIOS)}")
+    parser.add_argument("--users", type=int, default=50, help="Размер пула пользователей для login и profile")
+    parser.add_argument("--timeout", type=float, default=30, help="Таймаут запроса, секунд")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="Куда сохранить JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args(argv)
+    try:
+        args.weights = parse_weights(args.scenario)
+    except argparse.ArgumentTypeError as exc:
+        parser.error(str(exc))
+
+    try:
+        results, load = asyncio.run(run(args))
+    finally:
+        if not args.url and os.path.exists(LOADGEN_DB):
+            os.remove(LOADGEN_DB)
+
+    print_table(results, load)
+    write_report(args.output, results, {"load": load})
+    if args.compare:
+        compare_reports(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
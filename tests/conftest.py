@@ -0,0 +1,86 @@
+import asyncio
+import itertools
+import os
+import tempfile
+
+# Конфигурация читается при импорте app.config — задаём её до импорта приложения
+os.environ.setdefault("SECRET_KEY", "test-secret-key-" + "x" * 48)
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.sqlite")
+os.environ.setdefault("PASSWORD_HASH_EXECUTOR", "thread")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+# Тесты входят под одними и теми же email; блокировку проверяют отдельным экземпляром
+os.environ.setdefault("LOGIN_EMAIL_BURST", "1000")
+os.environ.setdefault("LOGIN_IP_BURST", "1000")
+
+
+def run_app(scenario):
+    """Выполняет `await scenario(client)` на чистой базе внутри lifespan приложения."""
+    import httpx
+
+    from app.cache import token_cache, user_cache
+    from app.database.database import Base, async_engine
+    from app.main import app
+
+    async def main():
+        # База каждый раз новая, а id и email в тестах повторяются
+        user_cache.clear()
+        token_cache.clear()
+        async with async_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+        try:
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    await scenario(client)
+        finally:
+            # При падении сценария lifespan не доходит до dispose, а потоки
+            # aiosqlite не дают процессу завершиться
+            await async_engine.dispose()
+
+    asyncio.run(main())
+
+
+async def register(client, email: str, role: str = "user"):
+    response = await client.post("/users/", json=dict(
+        first_name="a", last_name="b", middle_name="c", email=email,
+        password="1234", verf_password="1234", role=role
+    ))
+    assert response.status_code == 201, response.text
+
+
+async def login(client, email: str, password: str = "1234") -> dict:
+    response = await client.post("/users/token", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def admin_headers(client) -> dict:
+    await register(client, "admin@example.com", "admin")
+    tokens = await login(client, "admin@example.com")
+    return {"Authorization": "Bearer " + tokens["access_token"]}
+
+
+_emails = itertools.count()
+
+
+async def add_users(count: int, created_at=None, **fields) -> list[int]:
+    """Вставляет пользователей напрямую в БД, без bcrypt; возвращает их id."""
+    from datetime import datetime, timezone
+
+    from sqlalchemy import insert
+
+    from app.database.database import async_session_maker
+    from app.database.users import User
+
+    created_at = created_at or datetime(2024, 1, 1, tzinfo=timezone.utc)
+    values = [
+        {**dict(first_name="f", last_name="l", middle_name="m", email=f"bulk{next(_emails)}@example.com",
+                password_hash="x", created_at=created_at, updated_at=created_at), **fields}
+        for _ in range(count)
+    ]
+    async with async_session_maker() as db:
+        result = await db.execute(insert(User).returning(User.id, sort_by_parameter_order=True), values)
+        ids = list(result.scalars())
+        await db.commit()
+    return ids
@@ -0,0 +1,96 @@
+from conftest import admin_headers, register, run_app
+
+
+def test_bulk_deactivate_reports_repeated_ids_once():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        await register(client, "user@example.com")
+
+        response = await client.post("/admins/bulk/deactivate", headers=headers, json={"ids": [2, 2, 999, 2], "password": "1234"})
+        assert response.status_code == 200
+        body = response.json()
+        assert [(item["id"], item["status"]) for item in body["results"]] == [
+            (2, "deactivated"), (2, "duplicate"), (999, "not_found"), (2, "duplicate")
+        ]
+        assert body["summary"] == {"deactivated": 1, "duplicate": 2, "not_found": 1}
+
+    run_app(scenario)
+
+
+def test_import_reports_file_line_numbers():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        content = (
+            "first_name,last_name,middle_name,email,password\n"
+            "a,b,c,new@example.com,1234\n"
+            "a,b,c,not-an-email,1234\n"
+        )
+        response = await client.post("/admins/bulk/import", headers=headers, files={"file": ("users.csv", content.encode(), "text/csv")})
+        assert response.status_code == 200
+        assert [(item["line"], item["status"]) for item in response.json()["results"]] == [(2, "created"), (3, "invalid")]
+
+    run_app(scenario)
+
+
+def test_bulk_update_with_shared_values_is_one_statement():
+    from sqlalchemy import event
+
+    from app.database.database import async_engine
+
+    async def scenario(client):
+        headers = await admin_headers(client)
+        for email in ("u1@example.com", "u2@example.com", "u3@example.com"):
+            await register(client, email)
+
+        updates = []
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE users"):
+                updates.append(len(parameters) if executemany else 1)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+        try:
+            names = dict(first_name="X", last_name="Y", middle_name="Z")
+            response = await client.post("/admins/bulk/update", headers=headers, json={
+                "items": [{"id": user_id, **names} for user_id in (2, 3, 4, 999)]
+            })
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+        assert response.json()["summary"] == {"updated": 3, "not_found": 1}
+        # Один UPDATE ... WHERE id IN (...), а не параметры на каждую строку
+        assert updates == [1]
+
+    run_app(scenario)
+
+
+def test_import_reports_email_taken_during_import_as_conflict():
+    from sqlalchemy import insert
+
+    from app.database.crud import import_users_bulk
+    from app.database.database import async_session_maker
+    from app.database.users import User
+
+    async def scenario(client):
+        rows = [
+            dict(first_name="a", last_name="b", middle_name="c", email=email, password="1234", role="user")
+            for email in ("race@example.com", "free@example.com")
+        ]
+        async with async_session_maker() as db:
+            execute = db.execute
+
+            async def execute_after_registration(statement, *args, **kwargs):
+                # Регистрация успевает между проверкой занятых email и INSERT
+                if getattr(statement, "is_insert", False):
+                    async with async_session_maker() as other:
+                        await other.execute(insert(User).values(
+                            first_name="r", last_name="r", middle_name="r",
+                            email="race@example.com", password_hash="x"
+                        ))
+                        await other.commit()
+                return await execute(statement, *args, **kwargs)
+
+            db.execute = execute_after_registration
+            created = await import_users_bulk(db, rows)
+
+        assert created["race@example.com"] is None
+        assert created["free@example.com"] is not None
+
+    run_app(scenario)
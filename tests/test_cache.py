@@ -0,0 +1,54 @@
+from app.cache import UserCache
+from app.database.users import User
+
+
+def make_user(user_id: int, **fields) -> User:
+    values = dict(
+        id=user_id, first_name="a", last_name="b", middle_name="c", email=f"user{user_id}@example.com",
+        password_hash="x", role="user", is_active=True, token_version=0,
+    )
+    values.update(fields)
+    return User(**values)
+
+
+def test_invalidate_by_id_after_cache_filled():
+    cache = UserCache(maxsize=10, ttl=60, version_ttl=60)
+    hot = make_user(1)
+    cache.set(hot, cache.generation)
+    # Кэш заполняется до предела, а активный пользователь читается между вставками
+    for user_id in range(2, 40):
+        cache.set(make_user(user_id), cache.generation)
+        assert cache.get(hot.email) is not None
+
+    # Так поступают deactivate_user_by_id и массовые операции: только по id
+    cache.invalidate(user_id=hot.id)
+    assert cache.get(hot.email) is None
+
+
+def test_evicted_users_leave_index():
+    cache = UserCache(maxsize=5, ttl=60, version_ttl=60)
+    for user_id in range(1, 50):
+        cache.set(make_user(user_id), cache.generation)
+    assert len(cache._ids) == len(cache._users) == 5
+    assert cache.get("user1@example.com") is None
+    assert cache.get("user49@example.com").id == 49
+
+
+def test_email_change_drops_old_key():
+    cache = UserCache(maxsize=10, ttl=60, version_ttl=60)
+    cache.set(make_user(1), cache.generation)
+    cache.set(make_user(1, email="new@example.com"), cache.generation)
+    assert cache.get("user1@example.com") is None
+    assert cache.get("new@example.com").id == 1
+    cache.invalidate(email="new@example.com")
+    assert cache.get("new@example.com") is None
+
+
+def test_invalidate_by_email_drops_token_version():
+    cache = UserCache(maxsize=10, ttl=60, version_ttl=60)
+    user = make_user(1)
+    cache.set(user, cache.generation)
+    cache.set_version(user.id, 0, cache.generation)
+    cache.invalidate(email=user.email)
+    assert cache.get(user.email) is None
+    assert cache.get_version(user.id) is None
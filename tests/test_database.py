@@ -0,0 +1,83 @@
+import asyncio
+
+from sqlalchemy import text
+
+from app.database.database import ReadSessionRouter, create_engine, create_session_maker
+
+
+def test_replica_marked_down_on_connection_error_and_restored_by_probe(tmp_path):
+    async def scenario():
+        primary = create_session_maker(create_engine(f"sqlite+aiosqlite:///{tmp_path}/primary.sqlite"))
+        broken = create_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.sqlite")
+        healthy = create_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.sqlite")
+        replica = create_session_maker(broken)
+        router = ReadSessionRouter(primary, [replica], retry_after=0)
+
+        # Выбор реплики не берёт соединение
+        session = router.session()
+        assert session.info["replica"] == 0
+        assert broken.pool.checkedout() == 0
+
+        try:
+            await session.execute(text("SELECT 1"))
+        except Exception as exc:
+            router.failed(session, exc)
+        finally:
+            await session.close()
+
+        # Реплика исключена, запрос идёт на основную базу и запускает проверку
+        assert "replica" not in router.session().info
+        await asyncio.gather(*router._probes.values())
+        assert 0 in router._down_until
+
+        # Реплика поднялась: фоновый SELECT 1 возвращает её в работу
+        router.replicas[0] = create_session_maker(healthy)
+        assert "replica" not in router.session().info
+        await asyncio.gather(*router._probes.values())
+        assert router.session().info["replica"] == 0
+
+        for engine in (broken, healthy):
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_pre_ping_only_after_idle(tmp_path, monkeypatch):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.database.database import ping_idle_connections
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/ping.sqlite")
+        ping_idle_connections(engine, idle=0.05)
+        pings = []
+
+        def do_ping(dbapi_connection):
+            pings.append(dbapi_connection)
+            if len(pings) > 1:
+                raise OSError("connection lost")
+            return True
+        monkeypatch.setattr(engine.dialect, "do_ping", do_ping)
+
+        async def query():
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        # Повторная выдача сразу после возврата в пул (lazy-сессия) — без пинга
+        await query()
+        await query()
+        assert pings == []
+
+        await asyncio.sleep(0.06)
+        await query()
+        assert len(pings) == 1
+
+        # Соединение не ответило — пул открывает новое, запрос не падает
+        await asyncio.sleep(0.06)
+        await query()
+        assert len(pings) == 2
+        assert engine.pool.checkedin() == 1
+
+        await engine.dispose()
+
+    asyncio.run(scenario())
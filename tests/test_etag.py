@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+from conftest import add_users, admin_headers, login, register, run_app
+from app.activity import login_activity
+from app.api.responses import etag_matches, versions_etag
+
+
+async def get(client, path: str, headers: dict, etag: str | None = None, **params):
+    if etag is not None:
+        headers = {**headers, "If-None-Match": etag}
+    return await client.get(path, headers=headers, params=params)
+
+
+def test_listing_revalidation():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        [user_id, *_] = await add_users(3)
+
+        first = await get(client, "/admins/", headers, limit=2)
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "private, no-cache"
+
+        response = await get(client, "/admins/", headers, etag, limit=2)
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+        assert (await get(client, "/admins/", headers, f'W/{etag}, "other"', limit=2)).status_code == 304
+
+        # Другая страница — другой ETag
+        assert (await get(client, "/admins/", headers, etag, limit=3)).status_code == 200
+
+        await client.put(f"/admins/{user_id}", headers=headers, json=dict(first_name="x", last_name="y", middle_name="z"))
+        response = await get(client, "/admins/", headers, etag, limit=2)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    run_app(scenario)
+
+
+def test_profile_revalidation_ignores_login_activity():
+    async def scenario(client):
+        await register(client, "user@example.com")
+        tokens = await login(client, "user@example.com")
+        headers = {"Authorization": "Bearer " + tokens["access_token"]}
+
+        response = await get(client, "/users/me", headers)
+        etag = response.headers["ETag"]
+        assert etag.startswith('"') and etag.endswith('"')
+
+        # Вход обновляет счётчики активности, но не профиль
+        await login(client, "user@example.com")
+        await login_activity.flush()
+        assert (await get(client, "/users/me", headers, etag)).status_code == 304
+
+        response = await client.put("/users/me", headers=headers, json=dict(
+            first_name="x", last_name="y", middle_name="z", email="user@example.com"
+        ))
+        assert response.status_code == 200
+        response = await get(client, "/users/me", headers, etag)
+        assert response.status_code == 200
+        assert response.json()["first_name"] == "x"
+
+    run_app(scenario)
+
+
+class FakeRequest:
+    def __init__(self, if_none_match: str):
+        self.headers = {"if-none-match": if_none_match}
+
+
+def test_etag_helpers():
+    moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    etag = versions_etag([(1, moment)])
+    assert versions_etag([(1, moment)], more=True) != etag
+    assert etag_matches(FakeRequest("*"), etag)
+    assert etag_matches(FakeRequest(f'"a", W/{etag}'), etag)
+    assert not etag_matches(FakeRequest('"a"'), etag)
@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+from app.hashing import PasswordHasher
+
+
+def slow(value):
+    time.sleep(0.01)
+    return value
+
+
+def test_bulk_work_does_not_fill_interactive_queue():
+    async def scenario():
+        hasher = PasswordHasher("thread", workers=2, queue_size=2)
+        try:
+            bulk = [asyncio.create_task(hasher.run(slow, i, block=True)) for i in range(50)]
+            await asyncio.sleep(0)
+            assert hasher.stats()["queue_depth"] == 0
+            # Вход во время импорта получает слот, а не 503
+            assert await hasher.run(slow, "login") == "login"
+            assert await asyncio.gather(*bulk) == list(range(50))
+        finally:
+            hasher.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import time
+
+import jwt
+import pytest
+
+from app.config import SECRET_KEY
+from app.keys import KeyRing, main, parse_args
+
+
+def make_ring(directory, accept_legacy=False) -> KeyRing:
+    main(parse_args(["--dir", str(directory), "--alg", "EdDSA", "--kid", "k1"]))
+    ring = KeyRing("EdDSA", str(directory), None, reload_interval=0, accept_legacy=accept_legacy)
+    ring.load()
+    return ring
+
+
+def legacy_token() -> str:
+    return jwt.encode({"sub": "user@example.com", "exp": time.time() + 60}, SECRET_KEY, algorithm="HS256")
+
+
+def test_token_carries_kid_and_verifies_against_jwks_key(tmp_path):
+    ring = make_ring(tmp_path)
+    token = ring.encode({"sub": "user@example.com"})
+    assert jwt.get_unverified_header(token)["kid"] == "k1"
+    assert ring.decode(token)["sub"] == "user@example.com"
+    assert b'"kid":"k1"' in ring.jwks
+
+
+def test_unknown_kid_triggers_reload(tmp_path):
+    ring = make_ring(tmp_path)
+    other = KeyRing("EdDSA", str(tmp_path), None, reload_interval=3600)
+    other.load()
+    # Новый ключ выпущен другим процессом: kid ещё не известен этому
+    main(parse_args(["--dir", str(tmp_path), "--alg", "EdDSA", "--kid", "k2"]))
+    ring.load()
+    assert ring.active.kid == "k2"
+    assert other.decode(ring.encode({"sub": "user@example.com"}))["sub"] == "user@example.com"
+
+
+def test_retired_key_still_verifies(tmp_path):
+    ring = make_ring(tmp_path)
+    token = ring.encode({"sub": "user@example.com"})
+    main(parse_args(["--dir", str(tmp_path), "--alg", "EdDSA", "--kid", "k2", "--retire", "k1"]))
+    ring.load()
+    assert ring.active.kid == "k2"
+    assert ring.decode(token)["sub"] == "user@example.com"
+
+
+def test_legacy_hs256_rejected_in_asymmetric_mode_by_default(tmp_path):
+    with pytest.raises(jwt.InvalidTokenError):
+        make_ring(tmp_path).decode(legacy_token())
+
+
+def test_legacy_hs256_accepted_when_enabled(tmp_path):
+    ring = make_ring(tmp_path, accept_legacy=True)
+    assert ring.decode(legacy_token())["sub"] == "user@example.com"
+
+
+def test_hs256_mode_needs_no_kid():
+    ring = KeyRing("HS256", None, None, reload_interval=0)
+    assert ring.decode(ring.encode({"sub": "user@example.com"}))["sub"] == "user@example.com"
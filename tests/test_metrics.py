@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import metrics
+
+
+def test_failed_queries_are_timed_and_leave_no_state(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/metrics.sqlite")
+        metrics.instrument_engine(engine)
+        before = metrics._totals["db"][0]
+        async with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                await connection.execute(text("SELECT * FROM missing_table"))
+            await connection.execute(text("SELECT 1"))
+            assert "query_started" not in connection.sync_connection.info
+        await engine.dispose()
+        return metrics._totals["db"][0] - before
+
+    assert asyncio.run(scenario()) == 2
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import add_users, admin_headers, run_app
+from app.database.crud import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor({"created_at": created_at, "id": 42})) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bnVsbA", "WzFd"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+async def walk(client, headers, path, **params) -> list[dict]:
+    items, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = await client.get(path, headers=headers, params=query)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        items += body["items"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_pages_cover_every_user_once_with_created_at_ties():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        # Одинаковый created_at у многих строк: порядок и курсор держатся на id
+        tied = await add_users(12)
+        later = await add_users(5, created_at=datetime(2024, 2, 1, tzinfo=timezone.utc))
+        admins = await add_users(3, role="admin")
+        deleted = await add_users(4, is_active=False)
+
+        items = await walk(client, headers, "/admins/", limit=5)
+        ids = [item["id"] for item in items]
+        assert ids[:-1] == sorted(tied + admins) + later
+        assert len(ids) == len(set(ids)) == 12 + 5 + 3 + 1
+
+        admin_items = await walk(client, headers, "/admins/", limit=2, role="admin")
+        assert [item["id"] for item in admin_items][:3] == admins
+
+        assert [item["id"] for item in await walk(client, headers, "/admins/deleted", limit=3)] == deleted
+
+        created_to = datetime(2024, 1, 15, tzinfo=timezone.utc).isoformat()
+        assert [item["id"] for item in await walk(client, headers, "/admins/", limit=4, created_to=created_to)] == sorted(tied + admins)
+
+    run_app(scenario)
+
+
+def test_bad_cursor_is_400():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        response = await client.get("/admins/", headers=headers, params={"cursor": "garbage"})
+        assert response.status_code == 400
+
+    run_app(scenario)
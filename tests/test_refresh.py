@@ -0,0 +1,71 @@
+import time
+
+from conftest import login, register, run_app
+from app.revocation import RevocationIndex, revoked_refresh_tokens
+
+
+async def refresh(client, token: str):
+    return await client.post("/users/refresh-token", params={"refresh_token": token})
+
+
+async def me(client, tokens: dict):
+    return await client.get("/users/me", headers={"Authorization": "Bearer " + tokens["access_token"]})
+
+
+def test_rotation_and_reuse_revokes_all_tokens():
+    async def scenario(client):
+        await register(client, "user@example.com")
+        first = await login(client, "user@example.com")
+
+        response = await refresh(client, first["refresh_token"])
+        assert response.status_code == 200
+        second = response.json()
+        assert second["refresh_token"] != first["refresh_token"]
+        assert (await me(client, second)).status_code == 200
+
+        # Старый refresh-токен уже обменян: повтор означает кражу, отзываются все токены
+        assert (await refresh(client, first["refresh_token"])).status_code == 401
+        assert (await me(client, second)).status_code == 401
+        assert (await refresh(client, second["refresh_token"])).status_code == 401
+
+        third = await login(client, "user@example.com")
+        assert (await me(client, third)).status_code == 200
+
+    run_app(scenario)
+
+
+def test_reuse_detected_by_database_without_memory_index():
+    async def scenario(client):
+        await register(client, "user@example.com")
+        first = await login(client, "user@example.com")
+        second = (await refresh(client, first["refresh_token"])).json()
+
+        # Токен обменял другой процесс: в его памяти jti нет, но он есть в таблице
+        revoked_refresh_tokens.clear()
+        assert (await refresh(client, first["refresh_token"])).status_code == 401
+        assert (await me(client, second)).status_code == 401
+
+    run_app(scenario)
+
+
+def test_token_types_are_not_interchangeable():
+    async def scenario(client):
+        await register(client, "user@example.com")
+        tokens = await login(client, "user@example.com")
+        assert (await refresh(client, tokens["access_token"])).status_code == 401
+        swapped = {"access_token": tokens["refresh_token"]}
+        assert (await me(client, swapped)).status_code == 401
+
+    run_app(scenario)
+
+
+def test_revocation_index_prunes_expired():
+    index = RevocationIndex(bloom_bits=1024)
+    now = time.time()
+    index.add("old", now - 1)
+    index.add("live", now + 60)
+    assert "live" in index
+    assert "old" not in index
+    assert "missing" not in index
+    index.prune()
+    assert len(index) == 1
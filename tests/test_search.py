@@ -0,0 +1,67 @@
+from conftest import add_users, admin_headers, run_app
+
+
+async def search(client, headers, q: str, **params):
+    response = await client.get("/admins/search", headers=headers, params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def names(body: dict) -> set[str]:
+    return {item["last_name"] for item in body["items"]}
+
+
+def test_search_modes():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        await add_users(1, first_name="Иван", last_name="Иванов", email="ivanov@example.com")
+        await add_users(1, first_name="Ваня", last_name="Петров", email="petrov@example.com")
+        await add_users(1, first_name="Анна", last_name="Сидорова", email="anna@corp.example.com")
+        await add_users(1, first_name="Олег", last_name="Удалённый", email="gone@example.com", is_active=False)
+
+        assert names(await search(client, headers, "ИВАН")) == {"Иванов"}
+        assert names(await search(client, headers, "ван")) == {"Иванов", "Петров"}
+        # prefix — только с начала слова: «Ваня», но не «Иван»
+        assert names(await search(client, headers, "ван", mode="prefix")) == {"Петров"}
+        assert names(await search(client, headers, "corp.exa")) == {"Сидорова"}
+        assert "Иванов" in names(await search(client, headers, "ивонов", mode="fuzzy"))
+        assert names(await search(client, headers, "удал", deleted=True)) == {"Удалённый"}
+        assert names(await search(client, headers, "удал")) == set()
+        # Кавычки и операторы FTS не ломают запрос
+        assert names(await search(client, headers, '"ив" OR *')) == set()
+
+    run_app(scenario)
+
+
+def test_search_pages_and_validation():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        ids = await add_users(11, last_name="Смирнов")
+
+        seen, cursor = [], None
+        while True:
+            body = await search(client, headers, "смирн", limit=4, **({"cursor": cursor} if cursor else {}))
+            seen += [item["id"] for item in body["items"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        assert sorted(seen) == ids and len(seen) == len(set(seen))
+
+        assert (await client.get("/admins/search", headers=headers, params={"q": "ab"})).status_code == 422
+        assert (await client.get("/admins/search", headers=headers, params={"q": "abc", "cursor": "x"})).status_code == 400
+
+    run_app(scenario)
+
+
+def test_search_index_follows_updates():
+    async def scenario(client):
+        headers = await admin_headers(client)
+        [user_id] = await add_users(1, last_name="Кузнецов")
+        response = await client.put(f"/admins/{user_id}", headers=headers, json=dict(
+            first_name="f", last_name="Морозов", middle_name="m"
+        ))
+        assert response.status_code == 200
+        assert names(await search(client, headers, "кузнец")) == set()
+        assert names(await search(client, headers, "мороз")) == {"Морозов"}
+
+    run_app(scenario)
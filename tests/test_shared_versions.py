@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import tempfile
+import uuid
+from multiprocessing import shared_memory
+
+import pytest
+
+from app.shared_versions import DEACTIVATED, SharedVersionTable
+
+
+@pytest.fixture
+def table_name():
+    name = f"test_versions_{uuid.uuid4().hex[:12]}"
+    yield name
+    try:
+        segment = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        pass
+    else:
+        segment.close()
+        segment.unlink()
+    lock = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+    if os.path.exists(lock):
+        os.remove(lock)
+
+
+def open_table(name: str, slots: int = 16) -> SharedVersionTable:
+    table = SharedVersionTable(name, slots)
+    table.open()
+    return table
+
+
+def publish_in_worker(name: str, user_id: int, version: int):
+    table = open_table(name)
+    table.publish(user_id, version)
+    table.close()
+
+
+def test_revocation_visible_to_other_workers(table_name):
+    worker = open_table(table_name)
+    try:
+        assert not worker.rejects(7, 0)
+        process = multiprocessing.get_context("spawn").Process(target=publish_in_worker, args=(table_name, 7, 3))
+        process.start()
+        process.join(30)
+        assert process.exitcode == 0
+        assert worker.rejects(7, 2)
+        assert not worker.rejects(7, 3)
+    finally:
+        worker.close()
+
+
+def test_versions_only_grow_and_deactivation_rejects_everything(table_name):
+    first, second = open_table(table_name), open_table(table_name)
+    try:
+        first.publish(5, 4)
+        second.publish(5, 2)
+        assert second.min_version(5) == 4
+        second.publish(5, DEACTIVATED)
+        assert first.rejects(5, 10 ** 6)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_slot_collision_falls_back_to_database_path(table_name):
+    table = open_table(table_name, slots=16)
+    try:
+        table.publish(1, 3)
+        # Другой пользователь в том же слоте вытесняет запись: таблица молчит, а не пропускает
+        table.publish(17, 1)
+        assert table.min_version(1) is None
+        assert not table.rejects(1, 0)
+        assert table.rejects(17, 0)
+    finally:
+        table.close()
+
+
+def test_layout_mismatch_is_reported(table_name):
+    table = open_table(table_name, slots=16)
+    try:
+        with pytest.raises(RuntimeError):
+            open_table(table_name, slots=32)
+    finally:
+        table.close()
+
+
+def test_disabled_table_never_rejects():
+    table = SharedVersionTable("unused", 0)
+    table.open()
+    table.publish(1, DEACTIVATED)
+    assert not table.enabled
+    assert not table.rejects(1, 0)
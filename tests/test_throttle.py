@@ -0,0 +1,84 @@
+import pytest
+from starlette.requests import Request
+
+from app import throttle
+from app.throttle import LoginThrottle, client_ip
+
+
+def make_throttle(**options) -> LoginThrottle:
+    settings = dict(rate_per_minute=60, burst=100, lockout_threshold=3, lockout_base=30, lockout_max=900, max_entries=10)
+    settings.update(options)
+    return LoginThrottle(**settings)
+
+
+def test_lockout_after_threshold_doubles():
+    limiter = make_throttle()
+    for _ in range(3):
+        assert limiter.retry_after("user@example.com", 0) == 0
+        limiter.failure("user@example.com", 0)
+    assert limiter.retry_after("user@example.com", 0) == 30
+
+    limiter.failure("user@example.com", 31)
+    assert limiter.retry_after("user@example.com", 31) == 60
+
+    limiter.success("user@example.com", 100)
+    assert limiter.retry_after("user@example.com", 100) == 0
+
+
+def test_burst_exhaustion_waits_for_refill():
+    limiter = make_throttle(rate_per_minute=6, burst=2)
+    limiter.consume("1.2.3.4", 0)
+    limiter.consume("1.2.3.4", 0)
+    assert limiter.retry_after("1.2.3.4", 0) == pytest.approx(10)
+    assert limiter.retry_after("1.2.3.4", 10) == 0
+
+
+def test_spraying_keys_does_not_evict_lockout():
+    limiter = make_throttle()
+    for _ in range(3):
+        limiter.failure("victim@example.com", 0)
+    for index in range(100):
+        limiter.retry_after(f"spray{index}@example.com", 1)
+    assert limiter.stats()["evictions"] > 0
+    assert limiter.retry_after("victim@example.com", 1) > 0
+
+
+def test_expired_lock_returns_to_lru_keeping_failures():
+    limiter = make_throttle()
+    for _ in range(3):
+        limiter.failure("user@example.com", 0)
+    limiter.sweep(31)
+    assert limiter.stats()["locked"] == 0
+    assert limiter.retry_after("user@example.com", 31) == 0
+    limiter.failure("user@example.com", 31)
+    assert limiter.retry_after("user@example.com", 31) == 60
+
+
+def make_request(peer: str, forwarded: str | None = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+def test_client_ip_trusts_forwarded_for_only_from_proxies(monkeypatch):
+    monkeypatch.setattr(throttle, "_trusted_proxies", [throttle.ipaddress.ip_network("10.0.0.0/8")])
+    # Левое значение подставил клиент, правое дописал доверенный прокси
+    assert client_ip(make_request("10.0.0.1", "6.6.6.6, 1.2.3.4, 10.0.0.2")) == "1.2.3.4"
+    assert client_ip(make_request("1.2.3.4", "6.6.6.6")) == "1.2.3.4"
+    assert client_ip(make_request("10.0.0.1")) == "10.0.0.1"
+
+
+def test_login_endpoint_locks_out_after_failures(monkeypatch):
+    from conftest import register, run_app
+
+    monkeypatch.setattr(throttle, "email_throttle", make_throttle())
+
+    async def scenario(client):
+        await register(client, "user@example.com")
+        for _ in range(3):
+            response = await client.post("/users/token", data={"username": "user@example.com", "password": "wrong"})
+            assert response.status_code == 401
+        response = await client.post("/users/token", data={"username": "USER@example.com", "password": "1234"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+
+    run_app(scenario)
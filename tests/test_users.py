@@ -0,0 +1,18 @@
+from conftest import register, run_app
+
+
+def test_update_with_null_password_keeps_password_and_tokens():
+    async def scenario(client):
+        await register(client, "user@example.com")
+        response = await client.post("/users/token", data={"username": "user@example.com", "password": "1234"})
+        headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+
+        response = await client.put("/users/me", headers=headers, json=dict(
+            first_name="x", last_name="y", middle_name="z", email="user@example.com", password=None
+        ))
+        assert response.status_code == 200, response.text
+        assert (await client.get("/users/me", headers=headers)).json()["first_name"] == "x"
+        response = await client.post("/users/token", data={"username": "user@example.com", "password": "1234"})
+        assert response.status_code == 200
+
+    run_app(scenario)
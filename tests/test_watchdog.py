@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.watchdog import LoopWatchdog, WatchdogMiddleware
+
+
+def block_loop(seconds: float):
+    time.sleep(seconds)
+
+
+def test_block_reports_stack_and_reset():
+    async def scenario():
+        watchdog = LoopWatchdog(threshold=0.05, interval=0.01, top_n=5)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            block_loop(0.3)
+            await asyncio.sleep(0.05)
+
+            report = watchdog.report()
+            assert report["blocks"] >= 1
+            assert report["max_lag_ms"] >= 200
+            top = report["top"][0]
+            assert top["route"] == "background"
+            assert "block_loop" in top["stack"][0]
+
+            watchdog.reset()
+            assert watchdog.report()["blocks"] == 0
+            assert watchdog.report()["top"] == []
+        finally:
+            await watchdog.stop()
+
+    asyncio.run(scenario())
+
+
+def test_middleware_attributes_block_to_route():
+    async def scenario():
+        watchdog = LoopWatchdog(threshold=0.05, interval=0.01, top_n=5)
+        app = FastAPI()
+
+        @app.get("/slow/{item_id}")
+        async def slow(item_id: int):
+            block_loop(0.3)
+            return {"id": item_id}
+
+        transport = httpx.ASGITransport(app=WatchdogMiddleware(app, watchdog))
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/slow/1")
+                assert response.status_code == 200
+            await asyncio.sleep(0.05)
+
+            routes = [entry["route"] for entry in watchdog.report()["top"]]
+            assert "GET /slow/{item_id}" in routes
+            assert watchdog.requests == {}
+        finally:
+            await watchdog.stop()
+
+    asyncio.run(scenario())